@@ -0,0 +1,17 @@
+COMPRESS_OUTPUT_DIR = 'cache'
+STATICFILES_FINDERS += ('compressor.finders.CompressorFinder',)
+STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    }
+}
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': '/tmp/dmoj_test.sqlite3',
+        'TEST': {'MIGRATE': False},
+    },
+}
@@ -1,35 +1,135 @@
 from adminsortable2.admin import SortableAdminBase, SortableInlineAdminMixin
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.core.exceptions import PermissionDenied
-from django.db import connection, transaction
-from django.db.models import Q, TextField
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Q, TextField, prefetch_related_objects
 from django.forms import ModelForm, ModelMultipleChoiceField
 from django.http import Http404, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.urls import path, reverse, reverse_lazy
 from django.utils import timezone
 from django.utils.decorators import method_decorator
-from django.utils.html import format_html
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _, ngettext
 from django.views.decorators.http import require_POST
+from openpyxl import load_workbook
 from reversion.admin import VersionAdmin
-from judge.models import Class, Contest, ContestProblem, ContestSubmission, Profile, Rating, Submission, ContestMCQ, Problem, MCQQuestion
-from judge.ratings import rate_contest
+from judge.admin.emailing import EMAIL_RE, HAS_XLS_SUPPORT, XLS_UNSUPPORTED_ERROR
+from judge.models import Class, Contest, ContestMCQ, ContestParticipation, ContestProblem, \
+    MCQQuestion, Problem, Profile, Submission
+from judge.utils.celery import redirect_to_task_status, task_status_by_id, task_status_url
 from judge.utils.views import NoBatchDeleteMixin
 from judge.widgets import AdminAceWidget, AdminHeavySelect2MultipleWidget, AdminHeavySelect2Widget, \
     AdminMartorWidget, AdminSelect2MultipleWidget, AdminSelect2Widget
 import csv
+import functools
+import io
 import json
-from django.core.mail import send_mail
+import operator
+import re
+from django.core.mail import EmailMessage, get_connection
 from django.contrib.auth.models import User
 from judge.models import Profile
 from django import forms
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
 from django.db import transaction
 from django.conf import settings
 from django.utils.crypto import get_random_string
 
+try:
+    import orjson
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+else:
+    def _dumps(obj):
+        return orjson.dumps(obj).decode()
+
+    _loads = orjson.loads
+
+# Optional pandas import for legacy .xls support; HAS_XLS_SUPPORT says whether it and xlrd are installed
+try:
+    import pandas as pd
+except ImportError:
+    pass
+
+_EMAIL_COL_RE = re.compile('email', re.I)
+
+
+@functools.lru_cache(maxsize=None)
+def _rejudge_url_template():
+    # Admin URLs can't be reversed at import time, so resolve the pattern once on first use.
+    prefix, suffix = reverse('admin:judge_contest_rejudge', args=(0, 0)).rsplit('/0/judge/0/', 1)
+    return prefix + '/{0}/judge/{1}/' + suffix
+
+
+def _find_email_column(columns):
+    """Return the index of the first column whose header mentions "email", or 0 if none does."""
+    return next((i for i, col in enumerate(columns) if col is not None and _EMAIL_COL_RE.search(str(col))), 0)
+
+
+def _read_csv_emails(uploaded_file):
+    """Stream the email column (or the first column, if none is named so) out of a CSV upload."""
+    reader = csv.reader(io.TextIOWrapper(uploaded_file.file, encoding='utf-8', newline=''))
+    email_idx = _find_email_column(next(reader, None) or ())
+
+    emails = []
+    for row in reader:
+        if email_idx < len(row) and row[email_idx].strip():
+            emails.append(row[email_idx].strip())
+    return emails
+
+
+def _read_xlsx_emails(uploaded_file):
+    """Stream the email column (or the first column, if none is named so) out of an .xlsx upload."""
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        email_idx = _find_email_column(header)
+
+        emails = []
+        for row in rows:
+            if email_idx < len(row) and row[email_idx] is not None:
+                email = str(row[email_idx]).strip()
+                if email:
+                    emails.append(email)
+        return emails
+    finally:
+        workbook.close()
+
+
+def _read_xls_emails(uploaded_file):
+    """Read the email column (or the first column, if none is named so) out of a legacy .xls upload."""
+    # Read just the header first so that the full pass only parses the one column we need
+    columns = pd.read_excel(uploaded_file, nrows=0).columns
+    email_col = columns[_find_email_column(columns)]
+    uploaded_file.seek(0)
+    df = pd.read_excel(uploaded_file, usecols=[email_col], dtype=str)
+
+    emails = []
+    for email in df[email_col].dropna():
+        if email.strip():
+            emails.append(email.strip())
+    return emails
+
+
+# Uploads with more addresses than this are imported by a Celery task
+PRIVATE_CONTESTANT_SYNC_LIMIT = 500
+
+
+def _not_found_details(not_found_emails):
+    """Return the response fields listing the uploaded addresses that matched no user, at most 10 of them."""
+    if not not_found_emails:
+        return {}
+    if len(not_found_emails) <= 10:
+        return {'not_found_emails': not_found_emails}
+    return {'details': f"First 10 not found: {', '.join(not_found_emails[:10])}"}
+
+
+_CONTEST_PROBLEM_FIELDS = ('order', 'points', 'partial', 'is_pretested', 'max_submissions', 'output_prefix_override')
+
 
 class AdminHeavySelect2Widget(AdminHeavySelect2Widget):
     @property
@@ -37,35 +137,37 @@ class AdminHeavySelect2Widget(AdminHeavySelect2Widget):
         return False
 
 
+_DASHBOARD_HTML = mark_safe(
+    '<div style="margin: 10px 0;">'
+    '<button type="button" class="button" onclick="openDashboard()" style="padding: 10px 20px; font-size: 14px; background-color: #2980B9; color: white; border: none; border-radius: 5px; cursor: pointer; transition: background-color 0.3s; display: inline-flex; justify-content: center; align-items: center; text-align: center; line-height: normal; width: auto;">Open Problems Dashboard</button>'
+    '</div>'
+    '<script>'
+    'function openDashboard() {'
+    '   window.open("/judge-admin/contest/dashboard/", "ContestDashboard", "width=1200,height=800,scrollbars=yes,resizable=yes");'
+    '}'
+    'window.updateContestSelections = function(problems, mcqs, randomization) {'
+    '   document.getElementById("id_contest_problems_json").value = JSON.stringify(problems);'
+    '   document.getElementById("id_contest_mcqs_json").value = JSON.stringify(mcqs);'
+    '   document.getElementById("id_contest_randomization_json").value = JSON.stringify(randomization);'
+    '   alert("Selections updated! Click Save to persist.");'
+    '};'
+    'window.getContestSelections = function() {'
+    '   const p = document.getElementById("id_contest_problems_json").value;'
+    '   const m = document.getElementById("id_contest_mcqs_json").value;'
+    '   const r = document.getElementById("id_contest_randomization_json").value;'
+    '   return {'
+    '       problems: p ? JSON.parse(p) : [],'
+    '       mcqs: m ? JSON.parse(m) : [],'
+    '       randomization: r ? JSON.parse(r) : {}'
+    '   };'
+    '};'
+    '</script>'
+)
+
+
 class DashboardButtonWidget(forms.Widget):
     def render(self, name, value, attrs=None, renderer=None):
-        return format_html(
-            '<div style="margin: 10px 0;">'
-            '<button type="button" class="button" onclick="openDashboard()" style="padding: 10px 20px; font-size: 14px; background-color: #2980B9; color: white; border: none; border-radius: 5px; cursor: pointer; transition: background-color 0.3s; display: inline-flex; justify-content: center; align-items: center; text-align: center; line-height: normal; width: auto;">Open Problems Dashboard</button>'
-            '</div>'
-            '<script>'
-            'function openDashboard() {{'
-            '   window.open("/judge-admin/contest/dashboard/", "ContestDashboard", "width=1200,height=800,scrollbars=yes,resizable=yes");'
-            '}}'
-            'window.updateContestSelections = function(problems, mcqs, randomization) {{'
-            '   document.getElementById("id_contest_problems_json").value = JSON.stringify(problems);'
-            '   document.getElementById("id_contest_mcqs_json").value = JSON.stringify(mcqs);'
-            '   document.getElementById("id_contest_randomization_json").value = JSON.stringify(randomization);'
-            '   alert("Selections updated! Click Save to persist.");'
-            '}};'
-            'window.getContestSelections = function() {{'
-            '   const p = document.getElementById("id_contest_problems_json").value;'
-            '   const m = document.getElementById("id_contest_mcqs_json").value;'
-            '   const r = document.getElementById("id_contest_randomization_json").value;'
-            '   return {{'
-            '       problems: p ? JSON.parse(p) : [],'
-            '       mcqs: m ? JSON.parse(m) : [],'
-            '       randomization: r ? JSON.parse(r) : {{}}'
-            '   }};'
-            '}};'
-            '</script>'
-        )
-
+        return _DASHBOARD_HTML
 
 
 class ContestTagForm(ModelForm):
@@ -115,8 +217,8 @@ class ContestProblemInline(SortableInlineAdminMixin, admin.TabularInline):
     def rejudge_column(self, obj):
         if obj.id is None:
             return ''
-        return format_html('<a class="button rejudge-link action-link" href="{0}">{1}</a>',
-                           reverse('admin:judge_contest_rejudge', args=(obj.contest.id, obj.id)), _('Rejudge'))
+        url = _rejudge_url_template().format(int(obj.contest_id), int(obj.id))
+        return mark_safe(f'<a class="button rejudge-link action-link" href="{url}">{escape(_("Rejudge"))}</a>')
 
 
 class ContestMCQInlineForm(ModelForm):
@@ -154,8 +256,9 @@ class ContestForm(ModelForm):
         super(ContestForm, self).__init__(*args, **kwargs)
         if 'rate_exclude' in self.fields:
             if self.instance and self.instance.id:
-                self.fields['rate_exclude'].queryset = \
-                    Profile.objects.filter(contest_history__contest=self.instance).distinct()
+                self.fields['rate_exclude'].queryset = Profile.objects.filter(
+                    id__in=ContestParticipation.objects.filter(contest=self.instance).values('user_id'),
+                ).select_related('user')
             else:
                 self.fields['rate_exclude'].queryset = Profile.objects.none()
         self.fields['banned_users'].widget.can_add_related = False
@@ -164,7 +267,7 @@ class ContestForm(ModelForm):
         if self.instance and self.instance.pk:
             # Load existing selections
             p_data = []
-            for cp in self.instance.contest_problems.select_related('problem', 'problem__group').order_by('order'):
+            for cp in self.instance.contest_problems.all():
                 p_data.append({
                     'id': cp.problem_id,
                     'code': cp.problem.code,
@@ -179,7 +282,7 @@ class ContestForm(ModelForm):
                 })
             
             m_data = []
-            for cm in self.instance.contest_mcqs.select_related('mcq_question', 'mcq_question__group').order_by('order'):
+            for cm in self.instance.contest_mcqs.all():
                 m_data.append({
                     'id': cm.mcq_question_id,
                     'code': cm.mcq_question.code,
@@ -189,9 +292,9 @@ class ContestForm(ModelForm):
                     'group': cm.mcq_question.group.full_name if cm.mcq_question.group else 'Uncategorized'
                 })
                 
-            self.fields['contest_problems_json'].initial = json.dumps(p_data)
-            self.fields['contest_mcqs_json'].initial = json.dumps(m_data)
-            self.fields['contest_randomization_json'].initial = json.dumps(self.instance.randomization_config)
+            self.fields['contest_problems_json'].initial = _dumps(p_data)
+            self.fields['contest_mcqs_json'].initial = _dumps(m_data)
+            self.fields['contest_randomization_json'].initial = _dumps(self.instance.randomization_config)
 
     def clean(self):
         cleaned_data = super(ContestForm, self).clean()
@@ -243,128 +346,47 @@ class ContestAdmin(NoBatchDeleteMixin, SortableAdminBase, VersionAdmin):
     filter_horizontal = ['rate_exclude']
     date_hierarchy = 'start_time'
 
+    def get_object(self, request, object_id, from_field=None):
+        obj = super(ContestAdmin, self).get_object(request, object_id, from_field)
+        if obj is not None:
+            # ContestForm serializes these on every render; prefetch them here rather than in get_queryset,
+            # which would also prefetch them for every contest on the changelist.
+            prefetch_related_objects(
+                [obj],
+                Prefetch('contest_problems', queryset=ContestProblem.objects.select_related('problem__group')
+                         .only('contest', *_CONTEST_PROBLEM_FIELDS, 'problem__code', 'problem__name',
+                               'problem__group__full_name')
+                         .order_by('order')),
+                Prefetch('contest_mcqs', queryset=ContestMCQ.objects.select_related('mcq_question__group')
+                         .only('contest', 'order', 'points', 'mcq_question__code', 'mcq_question__name',
+                               'mcq_question__group__full_name')
+                         .order_by('order')),
+            )
+        return obj
+
     def save_related(self, request, form, formsets, change):
         super().save_related(request, form, formsets, change)
         # Only rescored if we did not already do so in `save_model`
         if not self._rescored and any(formset.has_changed() for formset in formsets):
             self._rescore(form.cleaned_data['key'])
             
-        # Process JSON data for Problems and MCQs
-        if 'contest_problems_json' in form.cleaned_data and form.cleaned_data['contest_problems_json']:
+        # Process JSON data for Problems and MCQs. The hidden fields are seeded with the current selections in
+        # ContestForm.__init__, so they only show up in changed_data when the dashboard actually modified them.
+        if 'contest_problems_json' in form.changed_data and form.cleaned_data['contest_problems_json']:
             try:
-                problems_data = json.loads(form.cleaned_data['contest_problems_json'])
-                
-                # Normalize input to list of dicts
-                normalized_problems = []
-                for item in problems_data:
-                    if isinstance(item, int): # Old format (just IDs)
-                        normalized_problems.append({'id': item})
-                    else:
-                        normalized_problems.append(item)
-                
-                current_problems = {cp.problem_id: cp for cp in form.instance.contest_problems.all()}
-                new_ids = set(int(p['id']) for p in normalized_problems)
-                
-                # Delete removed
-                form.instance.contest_problems.filter(problem_id__in=set(current_problems.keys()) - new_ids).delete()
-                
-                # Add new or update
-                for i, p_item in enumerate(normalized_problems):
-                    pid = int(p_item['id'])
-                    
-                    # Extract fields with defaults
-                    points = p_item.get('points')
-                    partial = p_item.get('partial', True)
-                    is_pretested = p_item.get('is_pretested', False)
-                    max_submissions = p_item.get('max_submissions')
-                    output_prefix_override = p_item.get('output_prefix_override', 0)
-                    
-                    if pid in current_problems:
-                        cp = current_problems[pid]
-                        # Update fields
-                        changed = False
-                        if cp.order != i:
-                            cp.order = i
-                            changed = True
-                        if points is not None and cp.points != points:
-                            cp.points = points
-                            changed = True
-                        if cp.partial != partial:
-                            cp.partial = partial
-                            changed = True
-                        if cp.is_pretested != is_pretested:
-                            cp.is_pretested = is_pretested
-                            changed = True
-                        if cp.max_submissions != max_submissions:
-                            cp.max_submissions = max_submissions
-                            changed = True
-                        if cp.output_prefix_override != output_prefix_override:
-                            cp.output_prefix_override = output_prefix_override
-                            changed = True
-                            
-                        if changed:
-                            cp.save()
-                    else:
-                        prob = Problem.objects.get(id=pid)
-                        ContestProblem.objects.create(
-                            contest=form.instance,
-                            problem=prob,
-                            points=points if points is not None else prob.points,
-                            partial=partial,
-                            is_pretested=is_pretested,
-                            max_submissions=max_submissions,
-                            output_prefix_override=output_prefix_override,
-                            order=i
-                        )
+                self._save_contest_problems(form.instance, _loads(form.cleaned_data['contest_problems_json']))
             except Exception as e:
                 pass # Log error?
 
-        if 'contest_mcqs_json' in form.cleaned_data and form.cleaned_data['contest_mcqs_json']:
+        if 'contest_mcqs_json' in form.changed_data and form.cleaned_data['contest_mcqs_json']:
             try:
-                mcq_data = json.loads(form.cleaned_data['contest_mcqs_json'])
-                
-                normalized_mcqs = []
-                for item in mcq_data:
-                    if isinstance(item, int):
-                        normalized_mcqs.append({'id': item})
-                    else:
-                        normalized_mcqs.append(item)
-
-                current_mcqs = {cm.mcq_question_id: cm for cm in form.instance.contest_mcqs.all()}
-                new_ids = set(int(m['id']) for m in normalized_mcqs)
-                
-                form.instance.contest_mcqs.filter(mcq_question_id__in=set(current_mcqs.keys()) - new_ids).delete()
-                
-                for i, m_item in enumerate(normalized_mcqs):
-                    mid = int(m_item['id'])
-                    points = m_item.get('points')
-
-                    if mid in current_mcqs:
-                        cm = current_mcqs[mid]
-                        changed = False
-                        if cm.order != i:
-                            cm.order = i
-                            changed = True
-                        if points is not None and cm.points != points:
-                            cm.points = points
-                            changed = True
-                        
-                        if changed:
-                            cm.save()
-                    else:
-                        mcq = MCQQuestion.objects.get(id=mid)
-                        ContestMCQ.objects.create(
-                            contest=form.instance,
-                            mcq_question=mcq,
-                            points=points if points is not None else mcq.points,
-                            order=i
-                        )
+                self._save_contest_mcqs(form.instance, _loads(form.cleaned_data['contest_mcqs_json']))
             except Exception as e:
                 pass
 
-        if 'contest_randomization_json' in form.cleaned_data and form.cleaned_data['contest_randomization_json']:
+        if 'contest_randomization_json' in form.changed_data and form.cleaned_data['contest_randomization_json']:
             try:
-                randomization_data = json.loads(form.cleaned_data['contest_randomization_json'])
+                randomization_data = _loads(form.cleaned_data['contest_randomization_json'])
                 form.instance.randomization_config = randomization_data
                 # Update randomize boolean based on config
                 form.instance.randomize = randomization_data.get('regular_enabled', False) or \
@@ -374,6 +396,106 @@ class ContestAdmin(NoBatchDeleteMixin, SortableAdminBase, VersionAdmin):
             except Exception as e:
                 pass
 
+    def _save_contest_problems(self, contest, problems_data):
+        # Normalize input to list of dicts
+        normalized_problems = []
+        for item in problems_data:
+            if isinstance(item, int):  # Old format (just IDs)
+                normalized_problems.append({'id': item})
+            else:
+                normalized_problems.append(item)
+
+        # Served from the prefetch done in get_object when editing an existing contest
+        current_problems = {cp.problem_id: cp for cp in contest.contest_problems.all()}
+        new_ids = set(int(p['id']) for p in normalized_problems)
+        problems = Problem.objects.filter(id__in=new_ids - set(current_problems.keys())).only('id', 'points')
+        problems = {prob.id: prob for prob in problems}
+
+        to_update = []
+        to_create = []
+        for i, p_item in enumerate(normalized_problems):
+            pid = int(p_item['id'])
+
+            # Extract fields with defaults
+            points = p_item.get('points')
+            partial = p_item.get('partial', True)
+            is_pretested = p_item.get('is_pretested', False)
+            max_submissions = p_item.get('max_submissions')
+            output_prefix_override = p_item.get('output_prefix_override', 0)
+
+            if pid in current_problems:
+                cp = current_problems[pid]
+                # Update fields
+                new_values = (i, points if points is not None else cp.points, partial, is_pretested,
+                              max_submissions, output_prefix_override)
+                if new_values != tuple(getattr(cp, field) for field in _CONTEST_PROBLEM_FIELDS):
+                    for field, value in zip(_CONTEST_PROBLEM_FIELDS, new_values):
+                        setattr(cp, field, value)
+                    to_update.append(cp)
+            elif pid in problems:
+                prob = problems[pid]
+                to_create.append(ContestProblem(
+                    contest=contest,
+                    problem=prob,
+                    points=points if points is not None else prob.points,
+                    partial=partial,
+                    is_pretested=is_pretested,
+                    max_submissions=max_submissions,
+                    output_prefix_override=output_prefix_override,
+                    order=i,
+                ))
+
+        removed = [cp.id for pid, cp in current_problems.items() if pid not in new_ids]
+
+        with transaction.atomic():
+            # Delete removed
+            if removed:
+                ContestProblem.objects.filter(id__in=removed).delete()
+            ContestProblem.objects.bulk_update(to_update, _CONTEST_PROBLEM_FIELDS)
+            ContestProblem.objects.bulk_create(to_create, batch_size=500)
+
+    def _save_contest_mcqs(self, contest, mcq_data):
+        normalized_mcqs = []
+        for item in mcq_data:
+            if isinstance(item, int):
+                normalized_mcqs.append({'id': item})
+            else:
+                normalized_mcqs.append(item)
+
+        current_mcqs = {cm.mcq_question_id: cm for cm in contest.contest_mcqs.all()}
+        new_ids = set(int(m['id']) for m in normalized_mcqs)
+        questions = MCQQuestion.objects.filter(id__in=new_ids - set(current_mcqs.keys())).only('id', 'points')
+        questions = {mcq.id: mcq for mcq in questions}
+
+        to_update = []
+        to_create = []
+        for i, m_item in enumerate(normalized_mcqs):
+            mid = int(m_item['id'])
+            points = m_item.get('points')
+
+            if mid in current_mcqs:
+                cm = current_mcqs[mid]
+                new_values = (i, points if points is not None else cm.points)
+                if new_values != (cm.order, cm.points):
+                    cm.order, cm.points = new_values
+                    to_update.append(cm)
+            elif mid in questions:
+                mcq = questions[mid]
+                to_create.append(ContestMCQ(
+                    contest=contest,
+                    mcq_question=mcq,
+                    points=points if points is not None else mcq.points,
+                    order=i,
+                ))
+
+        removed = [cm.id for mid, cm in current_mcqs.items() if mid not in new_ids]
+
+        with transaction.atomic():
+            if removed:
+                ContestMCQ.objects.filter(id__in=removed).delete()
+            ContestMCQ.objects.bulk_update(to_update, ('order', 'points'))
+            ContestMCQ.objects.bulk_create(to_create, batch_size=500)
+
     def has_change_permission(self, request, obj=None):
         if not request.user.has_perm('judge.edit_own_contest'):
             return False
@@ -405,18 +527,14 @@ class ContestAdmin(NoBatchDeleteMixin, SortableAdminBase, VersionAdmin):
 
     @admin.display(description=_('Lock contest submissions'))
     def set_locked(self, request, queryset):
-        for row in queryset:
-            self.set_locked_after(row, timezone.now())
-        count = queryset.count()
+        count = self.set_locked_after_bulk(queryset, timezone.now())
         self.message_user(request, ngettext('%d contest successfully locked.',
                                             '%d contests successfully locked.',
                                             count) % count)
 
     @admin.display(description=_('Unlock contest submissions'))
     def set_unlocked(self, request, queryset):
-        for row in queryset:
-            self.set_locked_after(row, None)
-        count = queryset.count()
+        count = self.set_locked_after_bulk(queryset, None)
         self.message_user(request, ngettext('%d contest successfully unlocked.',
                                             '%d contests successfully unlocked.',
                                             count) % count)
@@ -428,6 +546,16 @@ class ContestAdmin(NoBatchDeleteMixin, SortableAdminBase, VersionAdmin):
             Submission.objects.filter(contest_object=contest,
                                       contest__participation__virtual=0).update(locked_after=locked_after)
 
+    def set_locked_after_bulk(self, queryset, locked_after):
+        # Contest's post_save handler only clears cached descriptions, which do not depend on `locked_after`,
+        # so a queryset update is safe here.
+        contest_ids = list(queryset.values_list('id', flat=True))
+        with transaction.atomic():
+            Contest.objects.filter(id__in=contest_ids).update(locked_after=locked_after)
+            Submission.objects.filter(contest_object_id__in=contest_ids,
+                                      contest__participation__virtual=0).update(locked_after=locked_after)
+        return len(contest_ids)
+
     def get_urls(self):
         return [
             path('rate/all/', self.rate_all_view, name='judge_contest_rate_all'),
@@ -437,6 +565,8 @@ class ContestAdmin(NoBatchDeleteMixin, SortableAdminBase, VersionAdmin):
             path('generate-accounts/', self.generate_accounts_view, name='judge_contest_generate_accounts_new'),
             path('<int:contest_id>/add-private-contestants/', self.add_private_contestants_view, name='judge_contest_add_private_contestants'),
             path('add-private-contestants/', self.add_private_contestants_view, name='judge_contest_add_private_contestants_new'),
+            path('<int:contest_id>/add-private-contestants/success/<slug:task_id>/',
+                 self.add_private_contestants_success_view, name='judge_contest_add_private_contestants_success'),
         ] + super(ContestAdmin, self).get_urls()
 
     @method_decorator(require_POST)
@@ -444,26 +574,26 @@ class ContestAdmin(NoBatchDeleteMixin, SortableAdminBase, VersionAdmin):
         contest = get_object_or_404(Contest, id=contest_id)
         if not self.has_change_permission(request, contest):
             raise PermissionDenied()
-        queryset = ContestSubmission.objects.filter(problem_id=problem_id).select_related('submission')
-        for model in queryset:
-            model.submission.judge(rejudge=True, rejudge_user=request.user)
-
-        self.message_user(request, ngettext('%d submission was successfully scheduled for rejudging.',
-                                            '%d submissions were successfully scheduled for rejudging.',
-                                            len(queryset)) % len(queryset))
-        return HttpResponseRedirect(reverse('admin:judge_contest_change', args=(contest_id,)))
+        contest_problem = get_object_or_404(ContestProblem.objects.select_related('problem'),
+                                            id=problem_id, contest=contest)
+
+        from judge.tasks import rejudge_contest_problem
+        status = rejudge_contest_problem.delay(contest_problem.id, user_id=request.user.id)
+        return redirect_to_task_status(
+            status, message=_('Rejudging %s...') % (contest_problem.problem.name,),
+            redirect=reverse('admin:judge_contest_change', args=(contest_id,)),
+        )
 
     @method_decorator(require_POST)
     def rate_all_view(self, request):
         if not request.user.has_perm('judge.contest_rating'):
             raise PermissionDenied()
-        with transaction.atomic():
-            with connection.cursor() as cursor:
-                cursor.execute('TRUNCATE TABLE `%s`' % Rating._meta.db_table)
-            Profile.objects.update(rating=None)
-            for contest in Contest.objects.filter(is_rated=True, end_time__lte=timezone.now()).order_by('end_time'):
-                rate_contest(contest)
-        return HttpResponseRedirect(reverse('admin:judge_contest_changelist'))
+        from judge.tasks import rate_all_contests
+        status = rate_all_contests.delay()
+        return redirect_to_task_status(
+            status, message=_('Recalculating all contest ratings...'),
+            redirect=reverse('admin:judge_contest_changelist'),
+        )
 
     @method_decorator(require_POST)
     def rate_view(self, request, id):
@@ -489,48 +619,25 @@ class ContestAdmin(NoBatchDeleteMixin, SortableAdminBase, VersionAdmin):
             return JsonResponse({'error': 'No file uploaded'}, status=400)
         
         try:
-            # Try to import pandas for Excel support
-            try:
-                import pandas as pd
-                HAS_PANDAS = True
-            except ImportError:
-                HAS_PANDAS = False
-            
             emails = []
             file_name = csv_file.name.lower()
             
             # Handle CSV files
             if file_name.endswith('.csv'):
-                decoded_file = csv_file.read().decode('utf-8').splitlines()
-                reader = csv.reader(decoded_file)
-                next(reader, None)  # skip header if present
-                
-                for row in reader:
-                    if row and row[0].strip():
-                        emails.append(row[0].strip())
+                emails = _read_csv_emails(csv_file)
             
             # Handle Excel files
-            elif file_name.endswith(('.xlsx', '.xls')):
-                if not HAS_PANDAS:
+            elif file_name.endswith('.xlsx'):
+                emails = _read_xlsx_emails(csv_file)
+
+            # Legacy Excel files are not supported by openpyxl
+            elif file_name.endswith('.xls'):
+                if not HAS_XLS_SUPPORT:
                     return JsonResponse({
-                        'error': 'Excel file support requires pandas. Please install pandas and openpyxl.'
+                        'error': XLS_UNSUPPORTED_ERROR
                     }, status=400)
                 
-                df = pd.read_excel(csv_file)
-                # Try to find email column (case-insensitive)
-                email_col = None
-                for col in df.columns:
-                    if 'email' in str(col).lower():
-                        email_col = col
-                        break
-                
-                if email_col is None:
-                    # If no email column found, use first column
-                    email_col = df.columns[0]
-                
-                for email in df[email_col].dropna():
-                    if str(email).strip():
-                        emails.append(str(email).strip())
+                emails = _read_xls_emails(csv_file)
             
             else:
                 return JsonResponse({
@@ -542,36 +649,75 @@ class ContestAdmin(NoBatchDeleteMixin, SortableAdminBase, VersionAdmin):
             skipped_count = 0
             failed_emails = []
             
+            # MySQL compares emails and usernames case-insensitively, so do the same here
+            existing_emails = {e.lower() for e in User.objects.filter(email__in=emails).values_list('email', flat=True)}
+            # Only usernames that could collide with one generated below are read: those starting with a base
+            bases = sorted({email.split('@')[0][:20] for email in emails} - {''})
+            existing_usernames = set()
+            for start in range(0, len(bases), 500):
+                prefixes = functools.reduce(operator.or_, (Q(username__istartswith=base)
+                                                           for base in bases[start:start + 500]))
+                existing_usernames.update(u.lower() for u in User.objects.filter(prefixes)
+                                          .values_list('username', flat=True))
+            new_users = []
+            passwords = {}
+
             for email in emails:
                 # Check if user with this email already exists
-                if User.objects.filter(email=email).exists():
+                if email.lower() in existing_emails:
                     skipped_count += 1
                     continue
-                
+                existing_emails.add(email.lower())
+
                 # Generate unique username from email
                 base_username = email.split('@')[0][:20]  # Limit to 20 chars
                 username = base_username
                 counter = 1
-                
+
                 # Ensure username is unique
-                while User.objects.filter(username=username).exists():
+                while username.lower() in existing_usernames:
                     username = f"{base_username}{counter}"
                     counter += 1
-                
+                existing_usernames.add(username.lower())
+
                 # Generate random password
                 password = get_random_string(12)
-                
-                try:
-                    # Create new user
-                    user = User.objects.create_user(
-                        username=username,
-                        email=email,
-                        password=password
-                    )
-                    
-                    # Create associated profile
-                    Profile.objects.get_or_create(user=user)
-                    
+                user = User(username=username, email=email)
+                user.set_password(password)
+                new_users.append(user)
+                passwords[username] = password
+
+            with transaction.atomic():
+                for start in range(0, len(new_users), 500):
+                    batch = new_users[start:start + 500]
+                    try:
+                        with transaction.atomic():
+                            User.objects.bulk_create(batch)
+                    except IntegrityError:
+                        # A username or email in this batch was taken after it was checked, e.g. by a signup. Create
+                        # the batch one user at a time, so that only the conflicting accounts are left out.
+                        for user in batch:
+                            try:
+                                with transaction.atomic():
+                                    user.save(force_insert=True)
+                            except IntegrityError as e:
+                                failed_emails.append((user.email, str(e)))
+                                del passwords[user.username]
+                # bulk_create does not set primary keys on MySQL, so read the new users back
+                new_users = list(User.objects.filter(username__in=passwords.keys()))
+                # Create associated profiles
+                Profile.objects.bulk_create([Profile(user=user) for user in new_users], batch_size=500,
+                                            ignore_conflicts=True)
+
+            mail_connection = get_connection()
+            try:
+                mail_connection.open()
+            except Exception:
+                pass  # Each send below reconnects on its own and records the failure
+            try:
+                for user in new_users:
+                    username, email, password = user.username, user.email, passwords[user.username]
+
                     # Send welcome email with credentials
                     email_subject = 'Your Account Credentials - Please Change Password'
                     email_message = f"""Hello,
@@ -589,23 +735,21 @@ If you did not request this account, please contact support.
 
 Best regards,
 {settings.SITE_NAME if hasattr(settings, 'SITE_NAME') else 'Admin Team'}"""
-                    
+
                     try:
-                        send_mail(
+                        EmailMessage(
                             subject=email_subject,
-                            message=email_message,
+                            body=email_message,
                             from_email=settings.DEFAULT_FROM_EMAIL,
-                            recipient_list=[email],
-                            fail_silently=False,
-                        )
-                        created_count += 1
+                            to=[email],
+                            connection=mail_connection,
+                        ).send()
                     except Exception as e:
                         failed_emails.append((email, str(e)))
-                        created_count += 1  # Still count as created even if email failed
-                
-                except Exception as e:
-                    failed_emails.append((email, str(e)))
-            
+                    created_count += 1  # Still count as created even if email failed
+            finally:
+                mail_connection.close()
+
             # Build response message
             message_parts = []
             if created_count > 0:
@@ -648,48 +792,25 @@ Best regards,
             return JsonResponse({'error': 'No file uploaded'}, status=400)
         
         try:
-            # Try to import pandas for Excel support
-            try:
-                import pandas as pd
-                HAS_PANDAS = True
-            except ImportError:
-                HAS_PANDAS = False
-            
             emails = []
             file_name = csv_file.name.lower()
             
             # Handle CSV files
             if file_name.endswith('.csv'):
-                decoded_file = csv_file.read().decode('utf-8').splitlines()
-                reader = csv.reader(decoded_file)
-                next(reader, None)  # skip header if present
-                
-                for row in reader:
-                    if row and row[0].strip():
-                        emails.append(row[0].strip())
+                emails = _read_csv_emails(csv_file)
             
             # Handle Excel files
-            elif file_name.endswith(('.xlsx', '.xls')):
-                if not HAS_PANDAS:
+            elif file_name.endswith('.xlsx'):
+                emails = _read_xlsx_emails(csv_file)
+
+            # Legacy .xls workbooks aren't readable by openpyxl
+            elif file_name.endswith('.xls'):
+                if not HAS_XLS_SUPPORT:
                     return JsonResponse({
-                        'error': 'Excel file support requires pandas. Please install pandas and openpyxl.'
+                        'error': XLS_UNSUPPORTED_ERROR
                     }, status=400)
                 
-                df = pd.read_excel(csv_file)
-                # Try to find email column (case-insensitive)
-                email_col = None
-                for col in df.columns:
-                    if 'email' in str(col).lower():
-                        email_col = col
-                        break
-                
-                if email_col is None:
-                    # If no email column found, use first column
-                    email_col = df.columns[0]
-                
-                for email in df[email_col].dropna():
-                    if str(email).strip():
-                        emails.append(str(email).strip())
+                emails = _read_xls_emails(csv_file)
             
             else:
                 return JsonResponse({
@@ -701,51 +822,55 @@ Best regards,
                     'error': 'No email addresses found in file.'
                 }, status=400)
             
-            # Process each email
-            added_count = 0
+            # Drop repeated addresses, keeping the first spelling of each
+            unique_emails = {}
+            for email in emails:
+                unique_emails.setdefault(email.lower(), email)
+            emails = list(unique_emails.values())
+
+            # Strings that can't be an address are reported as not found without querying for them
+            not_found_emails = [email for email in emails if not EMAIL_RE.match(email)]
+            emails = [email for email in emails if EMAIL_RE.match(email)]
+
+            from judge.tasks.contest import add_private_contestants, import_private_contestants, \
+                save_private_contestant_emails
+
             already_added_count = 0
-            not_found_count = 0
-            not_found_emails = []
             profile_data = []  # Store profile data (id, username) for unsaved contests
-            
-            for email in emails:
-                try:
-                    # Lookup user by email
-                    user = User.objects.get(email=email)
-                    
-                    # Check if user has a profile
-                    if not hasattr(user, 'profile'):
-                        not_found_count += 1
+
+            if contest and len(emails) > PRIVATE_CONTESTANT_SYNC_LIMIT:
+                # Large uploads are processed in the background so the request doesn't hold a worker
+                status = import_private_contestants.delay(contest.id, save_private_contestant_emails(contest, emails))
+                message = f'Adding {len(emails)} user(s) to private contestants in the background.'
+                redirect = reverse('admin:judge_contest_add_private_contestants_success', args=(contest.id, status.id))
+                response_data = {
+                    'message': message,
+                    'status_url': task_status_url(status, message=message, redirect=redirect),
+                }
+                # The task reports the addresses it doesn't find, but these were rejected before it was queued
+                response_data.update(_not_found_details(not_found_emails))
+                return JsonResponse(response_data, status=202)
+            elif contest:
+                # For saved contests: add directly to ManyToMany field
+                added_count, already_added_count, missing = add_private_contestants(contest, emails)
+                not_found_emails += missing
+            else:
+                # For unsaved contests: return profile data (id and display name). Email comparison is
+                # case-insensitive under the MySQL collation; profile_id comes back None from the LEFT JOIN
+                # for users without a profile.
+                users = User.objects.filter(email__in=emails).values_list('email', 'username', 'profile__id')
+                users_by_email = {email.lower(): (username, profile_id) for email, username, profile_id in users}
+                for email in emails:
+                    username, profile_id = users_by_email.get(email.lower(), (None, None))
+                    if profile_id is None:
                         not_found_emails.append(email)
-                        continue
-                    
-                    profile = user.profile
-                    
-                    if contest:
-                        # For saved contests: add directly to ManyToMany field
-                        # Check if already added
-                        if contest.private_contestants.filter(id=profile.id).exists():
-                            already_added_count += 1
-                        else:
-                            # Add to private contestants
-                            contest.private_contestants.add(profile)
-                            added_count += 1
                     else:
-                        # For unsaved contests: return profile data (id and display name)
                         profile_data.append({
-                            'id': profile.id,
-                            'text': profile.user.username  # This is what select2 needs
+                            'id': profile_id,
+                            'text': username,  # This is what select2 needs
                         })
-                        added_count += 1
-                        
-                except User.DoesNotExist:
-                    not_found_count += 1
-                    not_found_emails.append(email)
-            
-            # Auto-set is_private flag if contestants were added (only for saved contests)
-            if contest and added_count > 0 and not contest.is_private:
-                contest.is_private = True
-                contest.save()
+                added_count = len(profile_data)
+            not_found_count = len(not_found_emails)
             
             # Build response message
             if contest:
@@ -769,10 +894,7 @@ Best regards,
             if not contest and profile_data:
                 response_data['profile_data'] = profile_data
             
-            if not_found_emails and len(not_found_emails) <= 10:
-                response_data['not_found_emails'] = not_found_emails
-            elif not_found_emails:
-                response_data['details'] = f"First 10 not found: {', '.join(not_found_emails[:10])}"
+            response_data.update(_not_found_details(not_found_emails))
             
             return JsonResponse(response_data)
             
@@ -781,6 +903,29 @@ Best regards,
                 'error': f'Error processing file: {str(e)}'
             }, status=500)
 
+    def add_private_contestants_success_view(self, request, contest_id, task_id):
+        """Report the outcome of a background private contestant import on the contest's page."""
+        contest = get_object_or_404(Contest, id=contest_id)
+        if not self.has_change_permission(request, contest):
+            raise PermissionDenied()
+        result = task_status_by_id(task_id).result
+        if not isinstance(result, dict):
+            raise Http404()
+
+        message = f"Successfully added {result['added']} user(s) to private contestants."
+        if result['already_added'] > 0:
+            message += f" Skipped {result['already_added']} already added."
+        self.message_user(request, message)
+
+        not_found_emails = result['not_found']
+        if not_found_emails:
+            listed = ', '.join(not_found_emails[:10])
+            if len(not_found_emails) > 10:
+                listed += ', ...'
+            self.message_user(request, f"Could not find {len(not_found_emails)} user(s) in the system: {listed}",
+                              messages.WARNING)
+        return HttpResponseRedirect(reverse('admin:judge_contest_change', args=(contest_id,)))
+
     def get_form(self, request, obj=None, **kwargs):
         form = super(ContestAdmin, self).get_form(request, obj, **kwargs)
         if 'problem_label_script' in form.base_fields:
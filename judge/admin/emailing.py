@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.admin import helpers
+from django.contrib.admin.views.main import ChangeList
 from django.shortcuts import render, redirect
 from django.urls import path, reverse
 from django.utils.html import format_html
@@ -8,6 +9,7 @@ from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.core.exceptions import PermissionDenied
 from django import forms
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import default_storage
 from django.core.mail import send_mail
 from django.utils.safestring import mark_safe
@@ -16,14 +18,54 @@ from django.template.loader import render_to_string
 from django.utils import timezone
 import csv
 import io
+import itertools
+import re
+from openpyxl import load_workbook
 from judge.models.emailing import EmailTemplate, BulkEmailCampaign, EmailRecipient, EmailLog
 
-# Optional pandas import for Excel support
+# Optional pandas import for legacy .xls support, which pandas reads through xlrd
 try:
     import pandas as pd
-    HAS_PANDAS = True
+    import xlrd  # noqa: F401
+    HAS_XLS_SUPPORT = True
 except ImportError:
-    HAS_PANDAS = False
+    HAS_XLS_SUPPORT = False
+
+XLS_UNSUPPORTED_ERROR = 'Legacy .xls file support requires pandas and xlrd. Please install them or upload a .xlsx file.'
+
+# Optional calamine import for faster Excel parsing
+try:
+    from python_calamine import CalamineWorkbook
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+RECIPIENT_BATCH_SIZE = 1000
+
+# Cheap shape check used to drop malformed rows before they reach the database
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+def _cell_value(value):
+    """Normalise a sheet cell, as calamine reads every number as a float while openpyxl keeps whole numbers as int."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _iter_sheet_emails(rows, email_column):
+    """Yield email data dicts from an iterator of sheet rows whose first row is the header."""
+    header = [str(_cell_value(col)) for col in next(rows, None) or ()]
+    if email_column not in header:
+        raise ValueError(f"Column '{email_column}' not found in Excel file")
+    for row in rows:
+        email_data = {col: _cell_value(value) for col, value in zip(header, row)}
+        email = str(email_data.get(email_column, '')).strip()
+        if EMAIL_RE.match(email):
+            email_data['email'] = email
+            yield email_data
 
 
 class EmailTemplateForm(forms.ModelForm):
@@ -43,6 +85,14 @@ class EmailTemplateForm(forms.ModelForm):
         self.fields['subject'].widget.attrs.update({'size': 80})
 
 
+class EmailTemplateChangeList(ChangeList):
+    def get_queryset(self, request, *args, **kwargs):
+        # The changelist never shows the body, which can be many kilobytes of HTML per template
+        return super().get_queryset(request, *args, **kwargs).select_related('created_by').only(
+            'name', 'subject', 'is_html', 'is_active', 'created_at', 'updated_at', 'created_by__username',
+        )
+
+
 @admin.register(EmailTemplate)
 class EmailTemplateAdmin(admin.ModelAdmin):
     form = EmailTemplateForm
@@ -68,6 +118,9 @@ class EmailTemplateAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_changelist(self, request, **kwargs):
+        return EmailTemplateChangeList
+
     def save_model(self, request, obj, form, change):
         if not change:  # Creating new template
             obj.created_by = request.user
@@ -133,9 +186,13 @@ class BulkEmailUploadForm(forms.Form):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Populate template choices dynamically
-        templates = EmailTemplate.objects.filter(is_active=True).values_list('id', 'name')
-        self.fields['template'].choices = [('custom', 'Custom Email (write your own)')] + list(templates)
+        # Populate template choices dynamically; the cached list is cleared whenever a template changes
+        templates = cache.get_or_set(
+            'email_templates:active',
+            lambda: list(EmailTemplate.objects.filter(is_active=True).values_list('id', 'name')),
+            300,
+        )
+        self.fields['template'].choices = [('custom', 'Custom Email (write your own)')] + templates
         
     def clean(self):
         cleaned_data = super().clean()
@@ -194,6 +251,12 @@ class BulkEmailCampaignAdmin(admin.ModelAdmin):
         }),
     )
     
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'template':
+            # The dropdown only needs the names, not every template body
+            kwargs['queryset'] = EmailTemplate.objects.only('id', 'name')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
     def progress_display(self, obj):
         if obj.total_emails == 0:
             return "No emails"
@@ -299,20 +362,29 @@ class BulkEmailCampaignAdmin(admin.ModelAdmin):
                     form.cleaned_data['email_column']
                 )
                 
-                # Create recipient records
-                recipients = []
-                for email_data in emails:
-                    email_addr = email_data.pop('email')  # Remove email from extra_data
-                    recipients.append(EmailRecipient(
-                        campaign=campaign,
-                        email=email_addr,
-                        extra_data=email_data
-                    ))
-                
-                EmailRecipient.objects.bulk_create(recipients, ignore_conflicts=True)
+                # Create recipient records in bounded chunks as the file is read
+                total_emails = 0
+                while True:
+                    recipients = [
+                        EmailRecipient(
+                            campaign=campaign,
+                            email=email_data.pop('email'),  # Remove email from extra_data
+                            extra_data=email_data,
+                        )
+                        for email_data in itertools.islice(emails, RECIPIENT_BATCH_SIZE)
+                    ]
+                    if not recipients:
+                        break
+                    EmailRecipient.objects.bulk_create(recipients, batch_size=RECIPIENT_BATCH_SIZE,
+                                                       ignore_conflicts=True)
+                    total_emails += len(recipients)
+
+                if not total_emails:
+                    email_column = form.cleaned_data['email_column']
+                    raise ValueError(f"No valid email addresses found in column '{email_column}'")
                 
                 # Update campaign totals
-                campaign.total_emails = len(recipients)
+                campaign.total_emails = total_emails
                 campaign.save()
                 
                 # Queue the campaign for sending
@@ -321,7 +393,7 @@ class BulkEmailCampaignAdmin(admin.ModelAdmin):
                 
                 messages.success(
                     request,
-                    f'Campaign "{campaign.name}" created successfully with {len(recipients)} recipients. '
+                    f'Campaign "{campaign.name}" created successfully with {total_emails} recipients. '
                     f'Emails are being sent in the background.'
                 )
                 
@@ -332,46 +404,62 @@ class BulkEmailCampaignAdmin(admin.ModelAdmin):
             return self.bulk_send_view(request)
             
     def extract_emails_from_file(self, uploaded_file, email_column):
-        """Extract email addresses and data from uploaded CSV/Excel file."""
-        emails = []
-        
+        """Yield email addresses and data from uploaded CSV/Excel file, one row at a time."""
         try:
             if uploaded_file.name.endswith('.csv'):
-                # Read CSV file
-                file_content = uploaded_file.read().decode('utf-8')
-                csv_reader = csv.DictReader(io.StringIO(file_content))
+                # Stream the CSV file instead of decoding it into memory in one go
+                csv_reader = csv.reader(io.TextIOWrapper(uploaded_file, encoding='utf-8', newline=''))
+                header = next(csv_reader, [])
+                if email_column not in header:
+                    return
+                # Resolve the column index once and only build a dict for rows that are kept
+                email_idx = header.index(email_column)
                 for row in csv_reader:
-                    if email_column in row and row[email_column].strip():
-                        email_data = dict(row)
-                        email_data['email'] = email_data[email_column].strip()
-                        emails.append(email_data)
+                    if email_idx >= len(row):
+                        continue
+                    email = row[email_idx].strip()
+                    if EMAIL_RE.match(email):
+                        email_data = dict(zip(header, row))
+                        email_data['email'] = email
+                        yield email_data
                         
-            elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-                # Read Excel file (requires pandas)
-                if not HAS_PANDAS:
-                    raise ValueError("Excel file support requires pandas. Please install pandas: pip install pandas openpyxl")
+            elif uploaded_file.name.endswith(('.xlsx', '.xls')) and HAS_CALAMINE:
+                # calamine parses both Excel formats natively and is much faster than openpyxl or pandas
+                sheet = CalamineWorkbook.from_filelike(uploaded_file).get_sheet_by_index(0)
+                yield from _iter_sheet_emails(iter(sheet.iter_rows()), email_column)
+
+            elif uploaded_file.name.endswith('.xlsx'):
+                # Read the sheet row by row in read-only mode rather than loading it into a DataFrame
+                workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+                try:
+                    yield from _iter_sheet_emails(workbook.active.iter_rows(values_only=True), email_column)
+                finally:
+                    workbook.close()
+
+            elif uploaded_file.name.endswith('.xls'):
+                # Read legacy Excel file (requires pandas)
+                if not HAS_XLS_SUPPORT:
+                    raise ValueError(XLS_UNSUPPORTED_ERROR)
                 
-                df = pd.read_excel(uploaded_file)
-                if email_column in df.columns:
-                    for _, row in df.iterrows():
-                        if pd.notna(row[email_column]) and str(row[email_column]).strip():
-                            email_data = row.to_dict()
-                            email_data['email'] = str(email_data[email_column]).strip()
-                            # Convert any NaN values to empty strings
-                            email_data = {k: (v if pd.notna(v) else '') for k, v in email_data.items()}
-                            emails.append(email_data)
-                else:
+                # Check the header before parsing the whole sheet
+                if email_column not in pd.read_excel(uploaded_file, nrows=0).columns:
                     raise ValueError(f"Column '{email_column}' not found in Excel file")
+                uploaded_file.seek(0)
+                df = pd.read_excel(uploaded_file)
+
+                # Filter and clean the rows with column operations rather than a Python loop over iterrows()
+                df = df[df[email_column].notna()]
+                email = df[email_column].astype(str).str.strip()
+                valid = email.str.match(EMAIL_RE)
+                # Convert any NaN values to empty strings
+                df = df[valid].astype(object).where(df[valid].notna(), '')
+                df['email'] = email[valid]
+                yield from df.to_dict('records')
             else:
                 raise ValueError("Unsupported file format. Please upload CSV or Excel files.")
                 
         except Exception as e:
             raise ValueError(f"Error processing file: {str(e)}")
-            
-        if not emails:
-            raise ValueError(f"No valid email addresses found in column '{email_column}'")
-            
-        return emails
     
     def has_add_permission(self, request):
         # Disable the default add view since we use custom bulk send
@@ -388,6 +476,12 @@ class EmailRecipientAdmin(admin.ModelAdmin):
     
     change_list_template = 'admin/emailing/recipients_changelist.html'
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('campaign').only(
+            'email', 'status', 'sent_at', 'error_message', 'extra_data',
+            'campaign__name', 'campaign__status',
+        )
+
     def has_add_permission(self, request):
         return False
         
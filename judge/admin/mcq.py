@@ -1,9 +1,12 @@
 from django import forms
 from django.contrib import admin
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.forms import ModelForm
+from django.db.models import Exists, OuterRef, Prefetch
+from django.forms import BaseInlineFormSet, ModelForm
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.translation import gettext, gettext_lazy as _, ngettext
 from reversion.admin import VersionAdmin
@@ -48,62 +51,60 @@ class MCQOptionInlineForm(ModelForm):
         }
 
 
+class MCQOptionFormSet(BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+
+        # Options of a question that is still being created aren't validated against its type
+        question = self.instance
+        if question.pk is None:
+            return
+
+        # Count correct answers from the formset
+        correct_count = sum(1 for form in self.forms
+                            if form.cleaned_data and not form.cleaned_data.get('DELETE', False) and
+                            form.cleaned_data.get('is_correct', False))
+
+        # Validate based on question type
+        question_type = question.question_type
+        if question_type == 'SINGLE':
+            if correct_count > 1:
+                raise ValidationError(
+                    _('Single choice questions can only have ONE correct answer. '
+                      'You have marked %(count)d options as correct.'),
+                    params={'count': correct_count},
+                )
+            elif correct_count == 0:
+                raise ValidationError(
+                    _('Single choice questions must have exactly one correct answer.'),
+                )
+        elif question_type == 'MULTIPLE':
+            if correct_count < 1:
+                raise ValidationError(
+                    _('Multiple choice questions must have at least one correct answer.'),
+                )
+
+
 class MCQOptionInline(admin.TabularInline):
     model = MCQOption
     form = MCQOptionInlineForm
+    formset = MCQOptionFormSet
     fields = ('option_text', 'is_correct')
     extra = 4
     min_num = 2
     max_num = 10
     validate_min = True
 
-    def get_formset(self, request, obj=None, **kwargs):
-        formset_class = super().get_formset(request, obj, **kwargs)
-        
-        # Add custom validation to the formset
-        original_clean = formset_class.clean
-        
-        def clean_with_validation(formset_self):
-            if original_clean:
-                original_clean(formset_self)
-            
-            if not obj:
-                return
-                
-            # Count correct answers from the formset
-            correct_count = 0
-            for form in formset_self.forms:
-                if form.cleaned_data and not form.cleaned_data.get('DELETE', False):
-                    if form.cleaned_data.get('is_correct', False):
-                        correct_count += 1
-            
-            # Validate based on question type
-            if obj.question_type == 'SINGLE':
-                if correct_count > 1:
-                    raise ValidationError(
-                        _('Single choice questions can only have ONE correct answer. You have marked %(count)d options as correct.'),
-                        params={'count': correct_count}
-                    )
-                elif correct_count == 0:
-                    raise ValidationError(
-                        _('Single choice questions must have exactly one correct answer.')
-                    )
-            elif obj.question_type == 'MULTIPLE':
-                if correct_count < 1:
-                    raise ValidationError(
-                        _('Multiple choice questions must have at least one correct answer.')
-                    )
-        
-        formset_class.clean = clean_with_validation
-        return formset_class
-
 
 class MCQCreatorListFilter(admin.SimpleListFilter):
     title = parameter_name = 'creator'
 
     def lookups(self, request, model_admin):
-        queryset = Profile.objects.exclude(authored_mcqs=None).values_list('user__username', flat=True)
-        return [(name, name) for name in queryset]
+        names = cache.get_or_set('mcq:creators', lambda: list(
+            Profile.objects.filter(authored_mcqs__isnull=False).values_list('user__username', flat=True)
+            .distinct().order_by('user__username'),
+        ), 300)
+        return [(name, name) for name in names]
 
     def queryset(self, request, queryset):
         if self.value() is None:
@@ -135,6 +136,7 @@ class MCQQuestionAdmin(NoBatchDeleteMixin, VersionAdmin):
     list_filter = ('is_public', 'question_type', MCQCreatorListFilter)
     form = MCQQuestionForm
     date_hierarchy = 'date'
+    actions = ['make_public', 'make_private']
 
     def get_readonly_fields(self, request, obj=None):
         fields = self.readonly_fields
@@ -146,10 +148,8 @@ class MCQQuestionAdmin(NoBatchDeleteMixin, VersionAdmin):
 
     @admin.display(description=_('authors'))
     def show_authors(self, obj):
-        authors = obj.authors.all()
-        if authors:
-            return ', '.join([author.user.username for author in authors])
-        return '-'
+        # Authors and their usernames are prefetched in get_queryset
+        return ', '.join(author.user.username for author in obj.authors.all()) or '-'
 
     @admin.display(description=_('Mark questions as public'))
     def make_public(self, request, queryset):
@@ -170,25 +170,29 @@ class MCQQuestionAdmin(NoBatchDeleteMixin, VersionAdmin):
     def get_actions(self, request):
         actions = super(MCQQuestionAdmin, self).get_actions(request)
         
-        if request.user.has_perm('judge.edit_all_mcq'):
-            func, name, desc = self.get_action('make_public')
-            actions[name] = (func, name, desc)
-            
-            func, name, desc = self.get_action('make_private')
-            actions[name] = (func, name, desc)
+        if not request.user.has_perm('judge.edit_all_mcq'):
+            actions.pop('make_public', None)
+            actions.pop('make_private', None)
         
         return actions
 
     def get_queryset(self, request):
-        queryset = super().get_queryset(request)
+        # Fetch authors together with their users in one query for show_authors
+        queryset = super().get_queryset(request).prefetch_related(
+            Prefetch('authors', queryset=Profile.objects.select_related('user').only('user__username')),
+            'options',
+        )
         if request.user.has_perm('judge.edit_all_mcq'):
-            return queryset.prefetch_related('authors__user', 'options').distinct()
-        # Filter to only show questions user can edit
+            return queryset
+        # Filter to only show questions user can edit. EXISTS subqueries don't multiply rows the way joining the
+        # three relations would, so no DISTINCT is needed.
+        profile = request.profile
         return queryset.filter(
-            models.Q(authors__user=request.user) |
-            models.Q(curators__user=request.user) |
-            models.Q(organizations__admins__user=request.user)
-        ).prefetch_related('authors__user', 'options').distinct()
+            Exists(MCQQuestion.authors.through.objects.filter(mcqquestion=OuterRef('pk'), profile=profile)) |
+            Exists(MCQQuestion.curators.through.objects.filter(mcqquestion=OuterRef('pk'), profile=profile)) |
+            Exists(MCQQuestion.organizations.through.objects.filter(mcqquestion=OuterRef('pk'),
+                                                                    organization__admins=profile)),
+        )
 
     def has_change_permission(self, request, obj=None):
         if obj is None:
@@ -202,7 +206,7 @@ class MCQQuestionAdmin(NoBatchDeleteMixin, VersionAdmin):
 
     def save_model(self, request, obj, form, change):
         # Handle organization privacy
-        if form.changed_data and 'organizations' in form.changed_data:
+        if 'organizations' in form.changed_data:
             obj.is_organization_private = bool(form.cleaned_data['organizations'])
         obj.randomize_options = True
         if obj.group is None:
@@ -233,8 +237,20 @@ class MCQQuestionAdmin(NoBatchDeleteMixin, VersionAdmin):
                     used_orders.add(next_order)
                     next_order += 1
             
+            # Write the options with one INSERT and one UPDATE rather than a query per option. bulk_update doesn't
+            # run pre_save, so the auto_now timestamp is set by hand.
+            now = timezone.now()
             for instance in instances:
-                instance.save()
+                if instance.pk is not None:
+                    instance.updated_at = now
+            with transaction.atomic():
+                for obj in formset.deleted_objects:
+                    obj.delete()
+                MCQOption.objects.bulk_create([instance for instance in instances if instance.pk is None])
+                MCQOption.objects.bulk_update([instance for instance in instances if instance.pk is not None],
+                                              ['option_text', 'is_correct', 'order', 'updated_at'])
+            # The bulk writes don't send the signals that drop the cached options, so drop them here
+            cache.delete('mcq:options:%d' % form.instance.id)
             formset.save_m2m()
         else:
             super().save_formset(request, form, formset, change)
@@ -251,6 +267,7 @@ class MCQSubmissionAdmin(admin.ModelAdmin):
     search_fields = ('user__user__username', 'question__code', 'question__name')
     readonly_fields = ('question', 'user', 'selected_options', 'is_correct', 'points_earned', 'time_taken', 'submitted_at')
     filter_horizontal = ('selected_options',)
+    list_select_related = ('user__user', 'question')
 
     @admin.display(description=_('user'), ordering='user__user__username')
     def user_display(self, obj):
@@ -273,13 +290,10 @@ class MCQSubmissionAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
         if request.user.has_perm('judge.edit_all_mcq'):
-            return queryset.select_related('user__user', 'question')
+            return queryset
         # Show only submissions for questions user can edit
+        profile = request.profile
         return queryset.filter(
-            models.Q(question__authors__user=request.user) |
-            models.Q(question__curators__user=request.user)
-        ).select_related('user__user', 'question').distinct()
-
-
-# Import models for the queryset filtering
-from django.db import models
+            Exists(MCQQuestion.authors.through.objects.filter(mcqquestion=OuterRef('question'), profile=profile)) |
+            Exists(MCQQuestion.curators.through.objects.filter(mcqquestion=OuterRef('question'), profile=profile)),
+        )
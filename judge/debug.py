@@ -15,26 +15,34 @@ DISABLE_COPY_PASTE_BLOCKING =True # Set to True to disable copy/paste blocking i
 # You can easily disable all debug features by setting this to False
 MASTER_DEBUG_ENABLED = True
 
+# Effective values, resolved once at import time
+CONTEST_REJOIN_DEBUG_ENABLED = MASTER_DEBUG_ENABLED and CONTEST_REJOIN_DEBUG
+CONTEST_TEMPLATE_DEBUG_ENABLED = MASTER_DEBUG_ENABLED and CONTEST_TEMPLATE_DEBUG
+PROCTORING_DEBUG_ENABLED = MASTER_DEBUG_ENABLED and PROCTORING_DEBUG
+PROCTORING_DISABLE_BACKEND_ENABLED = MASTER_DEBUG_ENABLED and PROCTORING_DISABLE_BACKEND
+GENERAL_CONTEST_DEBUG_ENABLED = MASTER_DEBUG_ENABLED and GENERAL_CONTEST_DEBUG
+DISABLE_COPY_PASTE_BLOCKING_ENABLED = MASTER_DEBUG_ENABLED and DISABLE_COPY_PASTE_BLOCKING
+
 def get_contest_rejoin_debug():
     """Get the contest rejoin debug setting"""
-    return MASTER_DEBUG_ENABLED and CONTEST_REJOIN_DEBUG
+    return CONTEST_REJOIN_DEBUG_ENABLED
 
 def get_contest_template_debug():
     """Get the contest template debug setting"""
-    return MASTER_DEBUG_ENABLED and CONTEST_TEMPLATE_DEBUG
+    return CONTEST_TEMPLATE_DEBUG_ENABLED
 
 def get_proctoring_debug():
     """Get the proctoring debug setting"""
-    return MASTER_DEBUG_ENABLED and PROCTORING_DEBUG
+    return PROCTORING_DEBUG_ENABLED
 
 def get_proctoring_disable_backend():
     """Get the proctoring backend disable setting"""
-    return MASTER_DEBUG_ENABLED and PROCTORING_DISABLE_BACKEND
+    return PROCTORING_DISABLE_BACKEND_ENABLED
 
 def get_general_contest_debug():
     """Get the general contest debug setting"""
-    return MASTER_DEBUG_ENABLED and GENERAL_CONTEST_DEBUG
+    return GENERAL_CONTEST_DEBUG_ENABLED
 
 def get_disable_copy_paste_blocking():
     """Get the copy/paste blocking disable setting"""
-    return MASTER_DEBUG_ENABLED and DISABLE_COPY_PASTE_BLOCKING
\ No newline at end of file
+    return DISABLE_COPY_PASTE_BLOCKING_ENABLED
@@ -1,16 +1,12 @@
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
 from judge.models.emailing import EmailTemplate
 
-
-class Command(BaseCommand):
-    help = 'Creates default email templates for HPE Hackathon platform'
-
-    def handle(self, *args, **options):
-        templates_data = [
-            {
-                'name': 'HPE Hackathon Registration Invitation',
-                'subject': 'Join the HPE Hackathon Platform - Registration Open!',
-                'body': '''<!DOCTYPE html>
+_TEMPLATES = (
+    {
+        'name': 'HPE Hackathon Registration Invitation',
+        'subject': 'Join the HPE Hackathon Platform - Registration Open!',
+        'body': '''<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -83,13 +79,13 @@ class Command(BaseCommand):
     </div>
 </body>
 </html>''',
-                'is_html': True,
-                'is_active': True,
-            },
-            {
-                'name': 'Contest Reminder - Join Now',
-                'subject': 'Don\'t Miss Out! Contest Starting Soon - Join Now',
-                'body': '''<!DOCTYPE html>
+        'is_html': True,
+        'is_active': True,
+    },
+    {
+        'name': 'Contest Reminder - Join Now',
+        'subject': 'Don\'t Miss Out! Contest Starting Soon - Join Now',
+        'body': '''<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -183,32 +179,56 @@ class Command(BaseCommand):
     </div>
 </body>
 </html>''',
-                'is_html': True,
-                'is_active': True,
-            }
-        ]
-        
-        created_count = 0
-        for template_data in templates_data:
-            template, created = EmailTemplate.objects.get_or_create(
-                name=template_data['name'],
-                defaults=template_data
-            )
-            if created:
-                created_count += 1
-                self.stdout.write(
-                    self.style.SUCCESS(f'Created template: "{template.name}"')
+        'is_html': True,
+        'is_active': True,
+    },
+)
+
+# Hashed once at import, so that unchanged templates are recognised without comparing the bodies
+_TEMPLATE_HASHES = {template['name']: EmailTemplate.hash_body(template['body']) for template in _TEMPLATES}
+
+
+class Command(BaseCommand):
+    help = 'Creates default email templates for HPE Hackathon platform'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--update', action='store_true', default=False,
+                            help='overwrite the subject and body of existing templates that differ from the defaults, '
+                                 'discarding any edits made to them')
+
+    def handle(self, *args, **options):
+        # Compare the stored hashes against the shipped ones in one query, and only write templates that differ
+        existing = dict(EmailTemplate.objects.filter(name__in=list(_TEMPLATE_HASHES))
+                        .values_list('name', 'content_hash'))
+
+        new_templates = []
+        updated_count = 0
+        for template_data in _TEMPLATES:
+            name = template_data['name']
+            content_hash = _TEMPLATE_HASHES[name]
+            if name not in existing:
+                new_templates.append(EmailTemplate(content_hash=content_hash, **template_data))
+                self.stdout.write(self.style.SUCCESS(f'Created template: "{name}"'))
+            elif existing[name] == content_hash:
+                self.stdout.write(self.style.WARNING(f'Template already up to date: "{name}"'))
+            elif options['update']:
+                # Whether the template is active is left to the admins
+                EmailTemplate.objects.filter(name=name).update(
+                    subject=template_data['subject'], body=template_data['body'], is_html=template_data['is_html'],
+                    content_hash=content_hash,
                 )
+                updated_count += 1
+                self.stdout.write(self.style.SUCCESS(f'Updated template: "{name}"'))
             else:
-                self.stdout.write(
-                    self.style.WARNING(f'Template already exists: "{template.name}"')
-                )
-        
-        if created_count > 0:
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully created {created_count} email template(s)')
-            )
+                self.stdout.write(self.style.WARNING(f'Template differs from the default, pass --update to '
+                                                     f'overwrite it: "{name}"'))
+
+        EmailTemplate.objects.bulk_create(new_templates, ignore_conflicts=True)
+        if new_templates or updated_count:
+            # bulk_create and update() skip the post_save handler that clears the cached template choices
+            cache.delete('email_templates:active')
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully created {len(new_templates)} and updated {updated_count} email template(s)'
+            ))
         else:
-            self.stdout.write(
-                self.style.WARNING('No new templates were created (all already exist)')
-            )
\ No newline at end of file
+            self.stdout.write(self.style.WARNING('No templates were created or updated'))
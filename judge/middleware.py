@@ -13,7 +13,7 @@ from django.urls import Resolver404, resolve, reverse
 from django.utils.encoding import force_bytes
 from requests.exceptions import HTTPError
 
-from judge.models import MiscConfig
+from judge.models import ContestParticipation, MiscConfig
 
 try:
     import uwsgi
@@ -87,6 +87,10 @@ class ContestMiddleware(object):
     def __call__(self, request):
         profile = request.profile
         if profile:
+            if profile.current_contest_id is not None:
+                # Load the participation with its contest in one query; update_contest and the views need both
+                profile.current_contest = ContestParticipation.objects.select_related('contest') \
+                    .filter(id=profile.current_contest_id).first()
             profile.update_contest()
             request.participation = profile.current_contest
             request.in_contest = request.participation is not None
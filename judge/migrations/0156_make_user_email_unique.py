@@ -2,6 +2,29 @@
 
 from django.db import migrations
 
+DEDUPE_CHUNK_SIZE = 1000
+
+
+def rename_duplicate_emails(apps, schema_editor):
+    # Handle any duplicate emails by appending _duplicate_{id} to every copy but the oldest. This is done a chunk
+    # at a time, so that no single statement holds locks on every duplicate row of a large auth_user table.
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            # The self-join is served by the email index created beforehand.
+            cursor.execute("""\
+SELECT DISTINCT `u1`.`id` FROM `auth_user` `u1`
+INNER JOIN `auth_user` `u2` ON (`u2`.`email` = `u1`.`email` AND `u2`.`id` < `u1`.`id`)
+WHERE `u1`.`email` != '' AND `u1`.`email` IS NOT NULL
+LIMIT %s
+""", (DEDUPE_CHUNK_SIZE,))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            cursor.execute(
+                "UPDATE `auth_user` SET `email` = CONCAT(`email`, '_duplicate_', `id`) WHERE `id` IN (%s)" %
+                ', '.join(['%s'] * len(ids)), ids,
+            )
+
 
 class Migration(migrations.Migration):
 
@@ -11,29 +34,25 @@ class Migration(migrations.Migration):
 
     operations = [
         migrations.RunSQL(
-            # First, handle any duplicate emails by appending _duplicate_{id}
+            # Index the column first, so that finding duplicates doesn't need a full scan and sort
             sql="""
-                UPDATE auth_user u1
-                INNER JOIN (
-                    SELECT email, MIN(id) as keep_id
-                    FROM auth_user
-                    WHERE email != '' AND email IS NOT NULL
-                    GROUP BY email
-                    HAVING COUNT(*) > 1
-                ) u2 ON u1.email = u2.email
-                SET u1.email = CONCAT(u1.email, '_duplicate_', u1.id)
-                WHERE u1.id != u2.keep_id;
+                CREATE INDEX idx_auth_user_email ON auth_user (email);
+            """,
+            reverse_sql="""
+                DROP INDEX idx_auth_user_email ON auth_user;
             """,
-            reverse_sql=migrations.RunSQL.noop,
         ),
+        migrations.RunPython(rename_duplicate_emails, migrations.RunPython.noop, atomic=False),
         migrations.RunSQL(
-            # Add unique constraint to email field
+            # Add unique constraint to email field, which supersedes the plain index
             sql="""
-                ALTER TABLE auth_user 
-                ADD UNIQUE INDEX unique_email (email);
+                ALTER TABLE auth_user
+                ADD UNIQUE INDEX unique_email (email),
+                DROP INDEX idx_auth_user_email;
             """,
             reverse_sql="""
-                ALTER TABLE auth_user 
+                ALTER TABLE auth_user
+                ADD INDEX idx_auth_user_email (email),
                 DROP INDEX unique_email;
             """,
         ),
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0164_contest_randomization_config_contest_randomize'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailrecipient',
+            index=models.Index(fields=['campaign', 'status'], name='email_recip_campaign_status'),
+        ),
+        migrations.AddIndex(
+            model_name='emailrecipient',
+            index=models.Index(fields=['status', 'sent_at'], name='email_recip_status_sent_at'),
+        ),
+        migrations.AddIndex(
+            model_name='emaillog',
+            index=models.Index(fields=['campaign', '-sent_at'], name='email_log_campaign_sent_at'),
+        ),
+        migrations.AddIndex(
+            model_name='emaillog',
+            index=models.Index(fields=['sent_by', '-sent_at'], name='email_log_sent_by_sent_at'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_template_bodies(apps, schema_editor):
+    EmailTemplate = apps.get_model('judge', 'EmailTemplate')
+    templates = list(EmailTemplate.objects.only('id', 'body'))
+    for template in templates:
+        template.content_hash = hashlib.md5(template.body.encode()).hexdigest()
+    EmailTemplate.objects.bulk_update(templates, ['content_hash'], batch_size=100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0165_emailing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailtemplate',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False,
+                                   help_text='MD5 of the body, used to detect unchanged templates', max_length=32),
+        ),
+        migrations.RunPython(hash_template_bodies, migrations.RunPython.noop, atomic=True),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0166_emailtemplate_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mcqsubmission',
+            index=models.Index(fields=['user', '-submitted_at'], name='mcq_sub_user_submitted_at'),
+        ),
+    ]
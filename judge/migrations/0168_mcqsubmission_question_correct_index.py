@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0167_mcqsubmission_user_submitted_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mcqsubmission',
+            index=models.Index(fields=['question', 'is_correct'], name='mcq_sub_question_correct'),
+        ),
+    ]
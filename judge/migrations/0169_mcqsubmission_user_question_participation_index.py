@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0168_mcqsubmission_question_correct_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mcqsubmission',
+            index=models.Index(fields=['user', 'question', 'participation'], name='mcq_sub_user_question_part'),
+        ),
+    ]
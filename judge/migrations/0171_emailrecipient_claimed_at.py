@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0170_emailrecipient_sending_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailrecipient',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a batch task started sending to this recipient', null=True),
+        ),
+    ]
@@ -2,7 +2,7 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.db import models, transaction
-from django.db.models import CASCADE, Q
+from django.db.models import CASCADE, Count, Q, Sum
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.functional import cached_property
@@ -744,28 +744,22 @@ class ContestMCQResult(models.Model):
         """
         from judge.models.mcq import MCQSubmission
         
-        # Get all MCQ questions in this contest
-        contest_mcqs = self.contest.contest_mcqs.all()
-        self.total_questions = contest_mcqs.count()
+        self.total_questions = self.contest.contest_mcqs.count()
         
-        # Get all submissions for this user in this contest
-        submissions = MCQSubmission.objects.filter(
+        # Tally this user's submissions in the contest in the database, rather than loading every submission
+        stats = MCQSubmission.objects.filter(
             user=self.user,
             participation=self.participation,
-            contest_object__contest=self.contest
-        ).select_related('question', 'contest_object').prefetch_related('selected_options')
-        
-        self.attempted = submissions.count()
-        self.correct = 0
-        self.wrong = 0
-        self.score = 0
-        
-        for submission in submissions:
-            if submission.is_correct:
-                self.correct += 1
-                self.score += submission.points_earned
-            else:
-                self.wrong += 1
+            contest_object__contest=self.contest,
+        ).aggregate(
+            attempted=Count('id'),
+            correct=Count('id', filter=Q(is_correct=True)),
+            score=Sum('points_earned', filter=Q(is_correct=True)),
+        )
+        self.attempted = stats['attempted']
+        self.correct = stats['correct']
+        self.wrong = self.attempted - self.correct
+        self.score = stats['score'] or 0
         
         self.save()
         return self.score
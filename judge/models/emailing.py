@@ -1,3 +1,5 @@
+import hashlib
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -15,6 +17,8 @@ class EmailTemplate(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     is_active = models.BooleanField(default=True, help_text="Whether this template is available for use")
+    content_hash = models.CharField(max_length=32, blank=True, db_index=True, editable=False,
+                                    help_text="MD5 of the body, used to detect unchanged templates")
     
     class Meta:
         verbose_name = "📝 Email Template"
@@ -24,6 +28,18 @@ class EmailTemplate(models.Model):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def hash_body(body):
+        """Return the content hash stored for the given template body."""
+        return hashlib.md5(body.encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.content_hash = self.hash_body(self.body)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'body' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
 
 class BulkEmailCampaign(models.Model):
     """Model for tracking bulk email campaigns."""
@@ -83,6 +99,13 @@ class BulkEmailCampaign(models.Model):
         self.status = 'processing'
         self.started_at = timezone.now()
         self.save(update_fields=['status', 'started_at'])
+
+    def increment_counts(self, sent=0, failed=0):
+        """Atomically add to the sent/failed counters, without recounting the recipients."""
+        BulkEmailCampaign.objects.filter(pk=self.pk).update(
+            emails_sent=models.F('emails_sent') + sent,
+            emails_failed=models.F('emails_failed') + failed,
+        )
         
     def mark_as_completed(self):
         """Mark campaign as completed based on success/failure counts."""
@@ -101,6 +124,7 @@ class EmailRecipient(models.Model):
     
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('sending', 'Sending'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
         ('invalid', 'Invalid Email'),
@@ -110,6 +134,8 @@ class EmailRecipient(models.Model):
     email = models.EmailField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     sent_at = models.DateTimeField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True,
+                                      help_text="When a batch task started sending to this recipient")
     error_message = models.TextField(blank=True)
     
     # Additional data from uploaded file (stored as JSON)
@@ -120,6 +146,10 @@ class EmailRecipient(models.Model):
         verbose_name = "📧 Email Recipient"
         verbose_name_plural = "📊 Recipients (Individual Status)"
         unique_together = ['campaign', 'email']
+        indexes = [
+            models.Index(fields=['campaign', 'status'], name='email_recip_campaign_status'),
+            models.Index(fields=['status', 'sent_at'], name='email_recip_status_sent_at'),
+        ]
         
     def __str__(self):
         return f"{self.email} - {self.get_status_display()}"
@@ -161,6 +191,10 @@ class EmailLog(models.Model):
         verbose_name = "📋 Email Log"
         verbose_name_plural = "📋 Logs (Complete History)"
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['campaign', '-sent_at'], name='email_log_campaign_sent_at'),
+            models.Index(fields=['sent_by', '-sent_at'], name='email_log_sent_by_sent_at'),
+        ]
         
     def __str__(self):
         status = "✓" if self.is_successful else "✗"
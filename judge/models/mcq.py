@@ -1,8 +1,9 @@
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
-from django.db.models import CASCADE, SET_NULL, Max
+from django.db.models import CASCADE, Max, SET_NULL
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.utils.functional import cached_property
@@ -159,6 +160,32 @@ class MCQQuestion(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    def get_option_correctness(self):
+        """
+        Map the id of each of this question's options to whether it is correct. This is read on every submission, so
+        it is cached until an option changes.
+        """
+        return cache.get_or_set('mcq:options:%d' % self.id,
+                                lambda: dict(self.options.values_list('id', 'is_correct')), 3600)
+
+    @staticmethod
+    def get_access_cache_key(mcq_id, user_id):
+        """
+        Return the cache key of a user's access decision for a private question. The key includes the question's
+        access version, so that bumping the version drops every user's decision at once.
+        """
+        version = cache.get_or_set('mcq:access_version:%d' % mcq_id, 0, None)
+        return 'mcq:access:%d:%d:%d' % (mcq_id, version, user_id)
+
+    @staticmethod
+    def invalidate_access_cache(mcq_ids):
+        for mcq_id in mcq_ids:
+            try:
+                cache.incr('mcq:access_version:%d' % mcq_id)
+            except ValueError:
+                # No version means no decision has been cached since the cache last lost it
+                pass
+
     def get_absolute_url(self):
         # URL pattern not yet implemented, return admin URL for now
         from django.urls import reverse
@@ -167,17 +194,44 @@ class MCQQuestion(models.Model):
         except:
             return '#'
 
+    @cached_property
+    def author_ids(self):
+        return MCQQuestion.authors.through.objects.filter(mcqquestion=self).values_list('profile_id', flat=True)
+
+    @cached_property
+    def editor_ids(self):
+        return self.author_ids.union(
+            MCQQuestion.curators.through.objects.filter(mcqquestion=self).values_list('profile_id', flat=True))
+
     def is_editor(self, profile):
-        return (self.authors.filter(id=profile.id) | self.curators.filter(id=profile.id)).exists()
+        # Query the through tables directly, stopping at the first match
+        return (MCQQuestion.authors.through.objects.filter(mcqquestion=self, profile=profile).exists() or
+                MCQQuestion.curators.through.objects.filter(mcqquestion=self, profile=profile).exists())
 
     def is_editable_by(self, user):
         if not user.is_authenticated:
             return False
+        # Active superusers have every permission, so they need neither the permission nor the editor lookups
+        if user.is_active and user.is_superuser:
+            return True
+        if self.id is None:
+            return self._is_editable_by(user)
+        # A request checks the same question several times (admin permissions, views, templates), so the results are
+        # remembered on the request's user object
+        try:
+            results = user._mcq_editable_cache
+        except AttributeError:
+            results = user._mcq_editable_cache = {}
+        if self.id not in results:
+            results[self.id] = self._is_editable_by(user)
+        return results[self.id]
+
+    def _is_editable_by(self, user):
         if not user.has_perm('judge.edit_own_mcq'):
             return False
         if user.has_perm('judge.edit_all_mcq'):
             return True
-        if user.profile in self.authors.all() or user.profile in self.curators.all():
+        if user.profile.id in self.editor_ids:
             return True
         if self.is_organization_private and self.organizations.filter(admins=user.profile).exists():
             return True
@@ -309,40 +363,54 @@ class MCQSubmission(models.Model):
         verbose_name = _('MCQ submission')
         verbose_name_plural = _('MCQ submissions')
         ordering = ['-submitted_at']
+        indexes = [
+            models.Index(fields=['user', '-submitted_at'], name='mcq_sub_user_submitted_at'),
+            models.Index(fields=['question', 'is_correct'], name='mcq_sub_question_correct'),
+            models.Index(fields=['user', 'question', 'participation'], name='mcq_sub_user_question_part'),
+        ]
         # Allow multiple submissions per user per question if different contests
         # but only one submission per user per question outside contests
 
-    def calculate_score(self):
+    def calculate_score(self, points=None, selected_ids=None, save=True):
         """
-        Calculate the score based on selected options
+        Calculate the score based on selected options, out of points if given (such as a contest's points for the
+        question) and the question's own points otherwise. Callers that just wrote the selection can pass its option
+        ids in selected_ids, so that it isn't read back, and with save=False the score is only set on the instance, to
+        be written by the caller's own save.
         """
-        correct_options = set(self.question.options.filter(is_correct=True))
-        selected = set(self.selected_options.all())
+        if points is None:
+            points = self.question.points
+        if selected_ids is None:
+            selected_ids = MCQSubmission.selected_options.through.objects.filter(mcqsubmission_id=self.pk) \
+                .values_list('mcqoption_id', flat=True)
+        # Score against the question's cached options instead of querying them on every submission
+        correctness = self.question.get_option_correctness()
+        selected = {option_id for option_id in selected_ids if option_id in correctness}
+        total_correct = sum(correctness.values())
+        correct_selected = sum(1 for option_id in selected if correctness[option_id])
+        incorrect_selected = len(selected) - correct_selected
+        # The selection is exactly the set of correct options
+        all_correct = correct_selected == total_correct and not incorrect_selected
         
         if self.question.question_type == 'SINGLE':
             # For single choice, must select exactly the correct option
-            if selected == correct_options and len(selected) == 1:
+            if all_correct and correct_selected == 1:
                 self.is_correct = True
-                self.points_earned = self.question.points
+                self.points_earned = points
             else:
                 self.is_correct = False
                 self.points_earned = 0.0
         
         elif self.question.question_type == 'MULTIPLE':
             # For multiple choice
-            if selected == correct_options:
+            if all_correct:
                 self.is_correct = True
-                self.points_earned = self.question.points
+                self.points_earned = points
             elif self.question.partial_credit and selected:
-                # Partial credit calculation
-                correct_selected = len(selected & correct_options)
-                incorrect_selected = len(selected - correct_options)
-                total_correct = len(correct_options)
-                
                 # Award partial points: (correct - incorrect) / total_correct
                 if correct_selected > incorrect_selected:
                     ratio = (correct_selected - incorrect_selected) / total_correct
-                    self.points_earned = max(0, self.question.points * ratio)
+                    self.points_earned = max(0, points * ratio)
                 else:
                     self.points_earned = 0.0
                 self.is_correct = False
@@ -350,4 +418,6 @@ class MCQSubmission(models.Model):
                 self.is_correct = False
                 self.points_earned = 0.0
         
-        self.save()
+        if save:
+            MCQSubmission.objects.filter(pk=self.pk).update(is_correct=self.is_correct,
+                                                            points_earned=self.points_earned)
@@ -0,0 +1,116 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from judge.models import BulkEmailCampaign, EmailRecipient, EmailTemplate
+from judge.models.tests.util import create_user
+from judge.tasks.emailing import SENDING_TIMEOUT, check_campaign_completion
+
+
+class BulkEmailCampaignTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.campaign = BulkEmailCampaign.objects.create(
+            name='campaign',
+            subject='subject',
+            body='body',
+            created_by=create_user(username='campaign_creator'),
+            total_emails=10,
+        )
+
+    def test_increment_counts(self):
+        self.campaign.increment_counts(sent=3)
+        self.campaign.increment_counts(sent=2, failed=1)
+        self.campaign.increment_counts(failed=2)
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.emails_sent, 5)
+        self.assertEqual(self.campaign.emails_failed, 3)
+        self.assertEqual(self.campaign.progress_percentage, 50)
+
+    def test_increment_counts_stale_instance(self):
+        # Counters are added in the database, so stale copies don't overwrite each other
+        other = BulkEmailCampaign.objects.get(pk=self.campaign.pk)
+        self.campaign.increment_counts(sent=1)
+        other.increment_counts(sent=1, failed=1)
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.emails_sent, 2)
+        self.assertEqual(self.campaign.emails_failed, 1)
+
+
+class EmailTemplateTestCase(TestCase):
+    def test_content_hash(self):
+        template = EmailTemplate.objects.create(name='hashed', subject='subject', body='first')
+        template.refresh_from_db()
+        self.assertEqual(template.content_hash, EmailTemplate.hash_body('first'))
+
+        template.body = 'second'
+        template.save()
+        template.refresh_from_db()
+        self.assertEqual(template.content_hash, EmailTemplate.hash_body('second'))
+
+    def test_content_hash_update_fields(self):
+        template = EmailTemplate.objects.create(name='partial', subject='subject', body='first')
+
+        template.body = 'second'
+        template.save(update_fields=['body'])
+        template.refresh_from_db()
+        self.assertEqual(template.body, 'second')
+        self.assertEqual(template.content_hash, EmailTemplate.hash_body('second'))
+
+        # Saving other fields leaves the hash alone
+        template.subject = 'changed'
+        template.save(update_fields=['subject'])
+        template.refresh_from_db()
+        self.assertEqual(template.content_hash, EmailTemplate.hash_body('second'))
+
+
+@mock.patch.object(check_campaign_completion, 'apply_async')
+class CampaignCompletionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.campaign = BulkEmailCampaign.objects.create(
+            name='completion',
+            subject='subject',
+            body='body',
+            created_by=create_user(username='completion_creator'),
+            status='processing',
+            total_emails=3,
+            emails_sent=1,
+        )
+        self.sent = EmailRecipient.objects.create(campaign=self.campaign, email='sent@example.com', status='sent')
+
+    def test_queued_recipients_wait(self, apply_async):
+        # A batch still in the queue is never given up on
+        queued = EmailRecipient.objects.create(campaign=self.campaign, email='queued@example.com')
+        check_campaign_completion(self.campaign.id)
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'pending')
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'processing')
+        apply_async.assert_called_once()
+
+    def test_sending_recipients_time_out(self, apply_async):
+        now = timezone.now()
+        lost = EmailRecipient.objects.create(campaign=self.campaign, email='lost@example.com', status='sending',
+                                             claimed_at=now - SENDING_TIMEOUT * 2)
+        sending = EmailRecipient.objects.create(campaign=self.campaign, email='sending@example.com',
+                                                status='sending', claimed_at=now)
+        check_campaign_completion(self.campaign.id)
+
+        lost.refresh_from_db()
+        self.assertEqual(lost.status, 'failed')
+        sending.refresh_from_db()
+        self.assertEqual(sending.status, 'sending')
+        apply_async.assert_called_once()
+
+        sending.status = 'sent'
+        sending.save()
+        check_campaign_completion(self.campaign.id)
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.emails_failed, 1)
+        self.assertEqual(self.campaign.status, 'partially_sent')
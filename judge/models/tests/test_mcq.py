@@ -0,0 +1,180 @@
+from django.test import TestCase
+
+from judge.models import ContestMCQ, ContestMCQResult, MCQOption, MCQQuestion, MCQSubmission
+from judge.models.tests.util import create_contest, create_contest_participation, create_user
+
+
+class MCQSubmissionScoreTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.profile = create_user(username='mcq_normal').profile
+
+        self.single = MCQQuestion.objects.create(
+            code='single',
+            name='single',
+            description='',
+            question_type='SINGLE',
+            points=2,
+        )
+        self.single_right = MCQOption.objects.create(question=self.single, option_text='right', is_correct=True)
+        self.single_wrong = MCQOption.objects.create(question=self.single, option_text='wrong', order=1)
+
+        self.multiple = MCQQuestion.objects.create(
+            code='multiple',
+            name='multiple',
+            description='',
+            question_type='MULTIPLE',
+            points=3,
+        )
+        self.multiple_right = [
+            MCQOption.objects.create(question=self.multiple, option_text='right', is_correct=True, order=order)
+            for order in range(3)
+        ]
+        self.multiple_wrong = MCQOption.objects.create(question=self.multiple, option_text='wrong', order=3)
+
+        self.partial = MCQQuestion.objects.create(
+            code='partial',
+            name='partial',
+            description='',
+            question_type='MULTIPLE',
+            points=3,
+            partial_credit=True,
+        )
+        self.partial_right = [
+            MCQOption.objects.create(question=self.partial, option_text='right', is_correct=True, order=order)
+            for order in range(3)
+        ]
+        self.partial_wrong = MCQOption.objects.create(question=self.partial, option_text='wrong', order=3)
+
+    def score(self, question, options, **kwargs):
+        submission = MCQSubmission.objects.create(question=question, user=self.profile)
+        submission.selected_options.set(options)
+        submission.calculate_score(**kwargs)
+        submission.refresh_from_db()
+        return submission.is_correct, submission.points_earned
+
+    def test_single_choice(self):
+        self.assertEqual(self.score(self.single, [self.single_right]), (True, 2))
+        self.assertEqual(self.score(self.single, [self.single_wrong]), (False, 0))
+        self.assertEqual(self.score(self.single, [self.single_right, self.single_wrong]), (False, 0))
+        self.assertEqual(self.score(self.single, []), (False, 0))
+
+    def test_multiple_choice(self):
+        self.assertEqual(self.score(self.multiple, self.multiple_right), (True, 3))
+        self.assertEqual(self.score(self.multiple, self.multiple_right[:2]), (False, 0))
+        self.assertEqual(self.score(self.multiple, self.multiple_right + [self.multiple_wrong]), (False, 0))
+
+    def test_partial_credit(self):
+        self.assertEqual(self.score(self.partial, self.partial_right), (True, 3))
+        self.assertEqual(self.score(self.partial, self.partial_right[:2]), (False, 2))
+        self.assertEqual(self.score(self.partial, self.partial_right[:2] + [self.partial_wrong]), (False, 1))
+        self.assertEqual(self.score(self.partial, self.partial_right[:1] + [self.partial_wrong]), (False, 0))
+        self.assertEqual(self.score(self.partial, []), (False, 0))
+
+    def test_points_override(self):
+        self.assertEqual(self.score(self.single, [self.single_right], points=5), (True, 5))
+        self.assertEqual(self.score(self.partial, self.partial_right[:2], points=6), (False, 4))
+
+    def test_selected_ids(self):
+        # The passed selection is scored instead of the stored one
+        submission = MCQSubmission.objects.create(question=self.single, user=self.profile)
+        submission.calculate_score(selected_ids=[self.single_right.id])
+        submission.refresh_from_db()
+        self.assertTrue(submission.is_correct)
+        self.assertEqual(submission.points_earned, 2)
+
+    def test_unsaved_score(self):
+        submission = MCQSubmission(question=self.single, user=self.profile)
+        submission.calculate_score(selected_ids=[self.single_right.id], save=False)
+        self.assertTrue(submission.is_correct)
+        self.assertEqual(submission.points_earned, 2)
+        self.assertIsNone(submission.pk)
+
+    def test_option_changes(self):
+        # Editing an option drops the question's cached options
+        question = MCQQuestion.objects.create(code='changed', name='changed', description='', points=1)
+        right = MCQOption.objects.create(question=question, option_text='right', is_correct=True)
+        wrong = MCQOption.objects.create(question=question, option_text='wrong', order=1)
+        self.assertEqual(self.score(question, [wrong]), (False, 0))
+
+        right.is_correct = False
+        right.save()
+        wrong.is_correct = True
+        wrong.save()
+        self.assertEqual(self.score(question, [wrong]), (True, 1))
+
+
+class ContestMCQResultTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.profile = create_user(username='mcq_contestant').profile
+        self.contest = create_contest(key='mcq_contest')
+        self.participation = create_contest_participation(contest=self.contest, user=self.profile)
+
+        self.contest_mcqs = [
+            ContestMCQ.objects.create(
+                contest=self.contest,
+                mcq_question=MCQQuestion.objects.create(code='result%d' % order, name='result', description=''),
+                points=points,
+                order=order,
+            )
+            for order, points in enumerate((4, 6, 10))
+        ]
+
+    def submit(self, contest_mcq, is_correct, points_earned):
+        return MCQSubmission.objects.create(
+            question=contest_mcq.mcq_question,
+            user=self.profile,
+            participation=self.participation,
+            contest_object=contest_mcq,
+            is_correct=is_correct,
+            points_earned=points_earned,
+        )
+
+    def test_calculate_score(self):
+        self.submit(self.contest_mcqs[0], True, 4)
+        # Partial credit isn't counted towards the score of a wrong answer
+        self.submit(self.contest_mcqs[1], False, 2)
+        # Neither are submissions outside the contest
+        MCQSubmission.objects.create(question=self.contest_mcqs[2].mcq_question, user=self.profile, is_correct=True,
+                                     points_earned=10)
+
+        result = ContestMCQResult.objects.create(user=self.profile, contest=self.contest,
+                                                 participation=self.participation)
+        self.assertEqual(result.calculate_score(), 4)
+
+        result.refresh_from_db()
+        self.assertEqual(result.total_questions, 3)
+        self.assertEqual(result.attempted, 2)
+        self.assertEqual(result.correct, 1)
+        self.assertEqual(result.wrong, 1)
+        self.assertEqual(result.score, 4)
+
+    def test_calculate_score_without_submissions(self):
+        result = ContestMCQResult.objects.create(user=self.profile, contest=self.contest,
+                                                 participation=self.participation)
+        self.assertEqual(result.calculate_score(), 0)
+
+        result.refresh_from_db()
+        self.assertEqual(result.total_questions, 3)
+        self.assertEqual((result.attempted, result.correct, result.wrong), (0, 0, 0))
+        self.assertEqual(result.score, 0)
+
+
+class MCQAccessCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.profile = create_user(username='mcq_curator').profile
+        self.question = MCQQuestion.objects.create(code='access', name='access', description='', is_public=False)
+
+    def test_access_version(self):
+        key = MCQQuestion.get_access_cache_key(self.question.id, self.profile.user_id)
+        self.assertEqual(MCQQuestion.get_access_cache_key(self.question.id, self.profile.user_id), key)
+
+        # Changing who can access the question moves every user to a new key
+        self.question.curators.add(self.profile)
+        curated_key = MCQQuestion.get_access_cache_key(self.question.id, self.profile.user_id)
+        self.assertNotEqual(curated_key, key)
+
+        self.question.save()
+        self.assertNotEqual(MCQQuestion.get_access_cache_key(self.question.id, self.profile.user_id), curated_key)
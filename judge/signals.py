@@ -5,12 +5,13 @@ from typing import Optional
 from django.conf import settings
 from django.core.cache import cache
 from django.core.cache.utils import make_template_fragment_key
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
 from .caching import finished_submission
-from .models import BlogPost, Comment, Contest, ContestProblem, ContestSubmission, EFFECTIVE_MATH_ENGINES, Judge, \
-    Language, License, MiscConfig, Organization, Problem, Profile, Submission, WebAuthnCredential
+from .models import BlogPost, Comment, Contest, ContestProblem, ContestSubmission, EFFECTIVE_MATH_ENGINES, \
+    EmailTemplate, Judge, Language, License, MCQOption, MCQQuestion, MiscConfig, Organization, Problem, ProblemGroup, \
+    ProblemType, Profile, Submission, WebAuthnCredential
 
 
 def get_pdf_path(basename: str) -> Optional[str]:
@@ -150,6 +151,80 @@ def misc_config_delete(sender, instance, **kwargs):
     cache.delete('misc_config')
 
 
+@receiver(post_save, sender=EmailTemplate)
+def email_template_update(sender, instance, **kwargs):
+    cache.delete('email_templates:active')
+
+
+@receiver(post_delete, sender=EmailTemplate)
+def email_template_delete(sender, instance, **kwargs):
+    cache.delete('email_templates:active')
+
+
+@receiver(m2m_changed, sender=MCQQuestion.authors.through)
+def mcq_authors_update(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        cache.delete('mcq:creators')
+
+
+@receiver(post_delete, sender=MCQQuestion)
+def mcq_question_delete(sender, instance, **kwargs):
+    cache.delete_many(['mcq:creators', 'mcq:access_version:%d' % instance.id])
+
+
+def _m2m_changed_ids(sender, instance, action, pk_set, field):
+    """Return the ids on the `field` side of the through rows that an m2m_changed signal adds or removes."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return []
+    if instance._meta.model_name == field:
+        return [instance.pk]
+    if action == 'pre_clear':
+        return sender.objects.filter(**{instance._meta.model_name: instance}).values_list(field + '_id', flat=True)
+    return pk_set
+
+
+@receiver(post_save, sender=MCQQuestion)
+def mcq_question_update(sender, instance, **kwargs):
+    MCQQuestion.invalidate_access_cache([instance.id])
+
+
+@receiver(m2m_changed, sender=MCQQuestion.authors.through)
+@receiver(m2m_changed, sender=MCQQuestion.curators.through)
+@receiver(m2m_changed, sender=MCQQuestion.organizations.through)
+def mcq_access_update(sender, instance, action, pk_set, **kwargs):
+    MCQQuestion.invalidate_access_cache(_m2m_changed_ids(sender, instance, action, pk_set, 'mcqquestion'))
+
+
+@receiver(m2m_changed, sender=Profile.organizations.through)
+@receiver(m2m_changed, sender=Organization.admins.through)
+def organization_members_update(sender, instance, action, pk_set, **kwargs):
+    # Membership and administration decide access to the organizations' private MCQ questions
+    organization_ids = _m2m_changed_ids(sender, instance, action, pk_set, 'organization')
+    if organization_ids:
+        mcq_ids = MCQQuestion.organizations.through.objects.filter(
+            organization_id__in=organization_ids, mcqquestion__is_organization_private=True,
+        ).values_list('mcqquestion_id', flat=True)
+        MCQQuestion.invalidate_access_cache(mcq_ids)
+
+
+@receiver(post_save, sender=MCQOption)
+@receiver(post_delete, sender=MCQOption)
+def mcq_option_update(sender, instance, **kwargs):
+    cache.delete('mcq:options:%d' % instance.question_id)
+
+
+@receiver(post_save, sender=ProblemGroup)
+@receiver(post_save, sender=ProblemType)
+def problem_category_update(sender, instance, **kwargs):
+    cache.delete_many(['contest_dashboard:categories', 'contest_dashboard:metadata'])
+
+
+@receiver(post_delete, sender=ProblemGroup)
+@receiver(post_delete, sender=ProblemType)
+def problem_category_delete(sender, instance, **kwargs):
+    cache.delete_many(['contest_dashboard:categories', 'contest_dashboard:metadata'])
+
+
 @receiver(post_save, sender=ContestSubmission)
 def contest_submission_update(sender, instance, **kwargs):
     Submission.objects.filter(id=instance.submission_id).update(contest_object_id=instance.participation.contest_id)
@@ -1,13 +1,27 @@
+import logging
+import uuid
+
 from celery import shared_task
 from django.conf import settings
+from django.contrib.auth.models import User
 from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
 from django.utils.translation import gettext as _
 from moss import MOSS
 
-from judge.models import Contest, ContestMoss, ContestParticipation, Submission
+from judge.models import Contest, ContestMoss, ContestParticipation, Profile, Rating, Submission
+from judge.ratings import rate_contest
 from judge.utils.celery import Progress
 
-__all__ = ('rescore_contest', 'run_moss')
+__all__ = ('import_private_contestants', 'rate_all_contests', 'rescore_contest', 'run_moss')
+
+logger = logging.getLogger('judge.tasks.contest')
+
+# Number of emails import_private_contestants adds at a time, reporting its progress after each
+PRIVATE_CONTESTANT_CHUNK_SIZE = 500
 
 
 @shared_task(bind=True)
@@ -25,6 +39,97 @@ def rescore_contest(self, contest_key):
     return rescored
 
 
+@shared_task(bind=True)
+def rate_all_contests(self):
+    with connection.cursor() as cursor:
+        cursor.execute('TRUNCATE TABLE `%s`' % Rating._meta.db_table)
+    Profile.objects.update(rating=None)
+
+    contests = Contest.objects.filter(is_rated=True, end_time__lte=timezone.now()).order_by('end_time')
+
+    rated = 0
+    with Progress(self, contests.count(), stage=_('Recalculating contest ratings')) as p:
+        for contest in contests.iterator():
+            # Rate each contest in its own transaction, so that one failure does not discard the whole rebuild.
+            try:
+                with transaction.atomic():
+                    rate_contest(contest)
+            except Exception:
+                logger.exception('Failed to rate contest %s', contest.key)
+            else:
+                rated += 1
+            p.did(1)
+    return rated
+
+
+def save_private_contestant_emails(contest, emails):
+    """Save `emails` for import_private_contestants, returning the storage path to pass it, so that the list itself
+    isn't put in the broker message."""
+    return default_storage.save('contest_imports/%d-%s.txt' % (contest.id, uuid.uuid4().hex),
+                                ContentFile('\n'.join(emails).encode('utf-8')))
+
+
+def add_private_contestants(contest, emails):
+    """Add the users registered under `emails` to the contest's private contestants.
+
+    Returns a tuple of (number added, number already added, emails with no matching profile)."""
+    # Email comparison is case-insensitive under the MySQL collation. profile_id comes back None from the
+    # LEFT JOIN for users without a profile.
+    users = User.objects.filter(email__in=emails).values_list('email', 'profile__id')
+    profile_ids = {email.lower(): profile_id for email, profile_id in users}
+    existing_ids = set(contest.private_contestants.filter(
+        id__in=[profile_id for profile_id in profile_ids.values() if profile_id is not None],
+    ).values_list('id', flat=True))
+
+    to_add = []
+    already_added = 0
+    not_found = []
+    for email in emails:
+        profile_id = profile_ids.get(email.lower())
+        if profile_id is None:
+            not_found.append(email)
+        elif profile_id in existing_ids:
+            already_added += 1
+        else:
+            to_add.append(profile_id)
+            existing_ids.add(profile_id)
+
+    if to_add:
+        # Commit the new contestants and the privacy flag together
+        with transaction.atomic():
+            contest.private_contestants.add(*to_add)
+            if not contest.is_private:
+                # Single-column UPDATE; this deliberately skips post_save, since the caches it clears
+                # (contest description and meta) don't depend on is_private.
+                Contest.objects.filter(pk=contest.pk).update(is_private=True)
+                contest.is_private = True
+
+    return len(to_add), already_added, not_found
+
+
+@shared_task(bind=True)
+def import_private_contestants(self, contest_id, path):
+    """Add the users whose emails are listed one per line in the storage file at `path`, which is then deleted."""
+    try:
+        with default_storage.open(path, 'rb') as f:
+            emails = f.read().decode('utf-8').splitlines()
+        contest = Contest.objects.get(id=contest_id)
+
+        added = already_added = 0
+        not_found = []
+        with Progress(self, len(emails), stage=_('Adding private contestants')) as p:
+            for start in range(0, len(emails), PRIVATE_CONTESTANT_CHUNK_SIZE):
+                chunk = emails[start:start + PRIVATE_CONTESTANT_CHUNK_SIZE]
+                chunk_added, chunk_already_added, chunk_not_found = add_private_contestants(contest, chunk)
+                added += chunk_added
+                already_added += chunk_already_added
+                not_found += chunk_not_found
+                p.did(len(chunk))
+        return {'added': added, 'already_added': already_added, 'not_found': not_found}
+    finally:
+        default_storage.delete(path)
+
+
 @shared_task(bind=True)
 def run_moss(self, contest_key):
     moss_api_key = settings.MOSS_API_KEY
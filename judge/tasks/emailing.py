@@ -1,15 +1,63 @@
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
 from django.conf import settings
 from django.template import Context, Template
 from django.utils import timezone
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from judge.models.emailing import BulkEmailCampaign, EmailRecipient, EmailLog, EmailTemplate
+from datetime import timedelta
+import functools
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Number of emails sent over a single mail server connection by one send_email_batch task
+EMAIL_BATCH_SIZE = 100
+# Number of sent emails whose outcome send_email_batch records at a time
+EMAIL_RECORD_CHUNK_SIZE = 10
+# Time after which a recipient still being sent is assumed to have been lost with its batch task
+SENDING_TIMEOUT = timedelta(minutes=30)
+# Number of invalid recipients marked with each UPDATE while queueing a campaign
+INVALID_RECIPIENT_BATCH_SIZE = 1000
+# Number of old email logs removed with each DELETE
+LOG_DELETE_BATCH_SIZE = 10000
+
+
+def _mark_invalid_recipients(campaign, recipient_ids):
+    EmailRecipient.objects.filter(id__in=recipient_ids).update(
+        status='invalid', error_message="Invalid email address format",
+    )
+    # Recipients rejected here never reach send_email_batch, so count them right away
+    campaign.increment_counts(failed=len(recipient_ids))
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_template(source):
+    # A campaign's batches mostly run in the same worker processes, so each one only parses its templates once
+    return Template(source)
+
+
+def _compile_campaign_templates(campaign):
+    """Parse the campaign's subject and body, returning (None, None) if they aren't valid templates."""
+    try:
+        return _compile_template(campaign.subject), _compile_template(campaign.body)
+    except Exception as e:
+        logger.warning(f"Template parsing failed for campaign {campaign.name}: {e}")
+        return None, None
+
+
+def _render_campaign_email(campaign, recipient, subject_template, body_template):
+    """Return the (subject, body) to send to a recipient, personalised with its extra data when there is any."""
+    if recipient.extra_data and subject_template is not None:
+        try:
+            context = Context({**recipient.extra_data, 'email': recipient.email})
+            return subject_template.render(context), body_template.render(context)
+        except Exception as e:
+            logger.warning(f"Template rendering failed for {recipient.email}: {e}")
+            # Continue with original content
+    return campaign.subject, campaign.body
+
 
 @shared_task(bind=True, max_retries=3)
 def send_bulk_email_campaign(self, campaign_id):
@@ -20,7 +68,8 @@ def send_bulk_email_campaign(self, campaign_id):
         campaign_id: ID of the BulkEmailCampaign to process
     """
     try:
-        campaign = BulkEmailCampaign.objects.get(id=campaign_id)
+        # The body is only needed by the batch tasks, so it isn't loaded here
+        campaign = BulkEmailCampaign.objects.only('id', 'name', 'status', 'started_at').get(id=campaign_id)
         campaign.mark_as_processing()
         
         logger.info(f"Starting bulk email campaign: {campaign.name}")
@@ -29,72 +78,62 @@ def send_bulk_email_campaign(self, campaign_id):
         recipients = EmailRecipient.objects.filter(
             campaign=campaign,
             status='pending'
-        ).select_related('campaign')
+        ).only('id', 'email')
+        total = recipients.count()
         
-        sent_count = 0
         failed_count = 0
         
-        for recipient in recipients:
+        # Valid recipients are sent in batches, each over a single mail server connection
+        batch = []
+        invalid_ids = []
+        # Stream the recipients in chunks, rather than holding every one of a large campaign in memory
+        for recipient in recipients.iterator(chunk_size=2000):
             try:
                 # Validate email
                 validate_email(recipient.email)
                 
-                # Prepare email content
-                subject = campaign.subject
-                body = campaign.body
-                
-                # Basic template variable replacement if extra_data exists
-                if recipient.extra_data:
-                    try:
-                        subject_template = Template(subject)
-                        body_template = Template(body)
-                        context = Context(recipient.extra_data)
-                        subject = subject_template.render(context)
-                        body = body_template.render(context)
-                    except Exception as e:
-                        logger.warning(f"Template rendering failed for {recipient.email}: {e}")
-                        # Continue with original content
-                
-                # Send email
-                send_single_email.delay(
-                    recipient.id,
-                    recipient.email,
-                    subject,
-                    body,
-                    campaign.is_html,
-                    campaign.created_by.id if campaign.created_by else None
-                )
+                batch.append(recipient.id)
+                if len(batch) >= EMAIL_BATCH_SIZE:
+                    send_email_batch.delay(campaign_id, batch)
+                    batch = []
                 
-                # Note: We'll let send_single_email handle success/failure tracking
+                # Note: We'll let send_email_batch handle success/failure tracking
                 # Count will be updated after all emails are processed
                     
             except ValidationError:
                 # Invalid email address
-                recipient.status = 'invalid'
-                recipient.error_message = "Invalid email address format"
-                recipient.save()
+                invalid_ids.append(recipient.id)
+                if len(invalid_ids) >= INVALID_RECIPIENT_BATCH_SIZE:
+                    _mark_invalid_recipients(campaign, invalid_ids)
+                    invalid_ids = []
                 failed_count += 1
                 logger.warning(f"Invalid email address: {recipient.email}")
                 
             except Exception as e:
                 # Other errors
                 recipient.mark_as_failed(str(e))
+                campaign.increment_counts(failed=1)
                 failed_count += 1
                 logger.error(f"Error processing recipient {recipient.email}: {e}")
         
-        # Update campaign statistics by counting actual recipient statuses
+        if batch:
+            send_email_batch.delay(campaign_id, batch)
+        if invalid_ids:
+            _mark_invalid_recipients(campaign, invalid_ids)
+        
+        # Update campaign statistics
         # Note: Individual email tasks will update these counts as they complete
         # We'll mark the campaign as completed when all emails are processed
         
         logger.info(f"Queued bulk email campaign: {campaign.name}. "
-                   f"Total recipients: {recipients.count()}")
+                   f"Total recipients: {total}")
         
         # Schedule a task to check completion status after a delay
         check_campaign_completion.apply_async(args=[campaign_id], countdown=60)
         
         return {
             'campaign_id': campaign_id,
-            'total_queued': recipients.count(),
+            'total_queued': total - failed_count,
             'status': 'processing'
         }
         
@@ -116,6 +155,108 @@ def send_bulk_email_campaign(self, campaign_id):
         raise
 
 
+@shared_task(bind=True, max_retries=3)
+def send_email_batch(self, campaign_id, recipient_ids):
+    """
+    Celery task to send a batch of a campaign's emails over one mail server connection.
+    
+    Args:
+        campaign_id: ID of the BulkEmailCampaign being sent
+        recipient_ids: IDs of the EmailRecipient records in this batch
+        
+    Returns:
+        dict: Number of emails sent and failed
+    """
+    campaign = BulkEmailCampaign.objects.get(id=campaign_id)
+    recipients = list(EmailRecipient.objects.filter(id__in=recipient_ids, status='pending')
+                      .only('id', 'email', 'extra_data'))
+    subject_template, body_template = _compile_campaign_templates(campaign)
+    
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=60)
+        # Give up on the batch, so that the campaign can still complete
+        logger.error(f"Could not connect to the mail server for campaign {campaign.name}: {e}")
+        EmailRecipient.objects.filter(id__in=[recipient.id for recipient in recipients]).update(
+            status='failed', error_message=str(e),
+        )
+        campaign.increment_counts(failed=len(recipients))
+        return {'sent': 0, 'failed': len(recipients)}
+    
+    # Claim the batch before sending. Should this task die part way, its unrecorded recipients stay 'sending', so
+    # that a redelivery of the task doesn't mail them again, and check_campaign_completion times them out.
+    EmailRecipient.objects.filter(id__in=[recipient.id for recipient in recipients], status='pending') \
+        .update(status='sending', claimed_at=timezone.now())
+    
+    sent_ids = []
+    failed_count = 0
+    logs = []
+    total_sent = total_failed = 0
+
+    def record_outcomes():
+        # Record the outcomes a small chunk at a time, so that little is lost if the worker stops mid-batch
+        nonlocal sent_ids, failed_count, logs, total_sent, total_failed
+        EmailRecipient.objects.filter(id__in=sent_ids).update(status='sent', sent_at=timezone.now())
+        campaign.increment_counts(sent=len(sent_ids), failed=failed_count)
+        EmailLog.objects.bulk_create(logs)
+        total_sent += len(sent_ids)
+        total_failed += failed_count
+        sent_ids, failed_count, logs = [], 0, []
+
+    try:
+        for recipient in recipients:
+            subject, body = _render_campaign_email(campaign, recipient, subject_template, body_template)
+            message = EmailMultiAlternatives(
+                subject=subject,
+                body=body if not campaign.is_html else '',
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[recipient.email],
+                connection=connection,
+            )
+            if campaign.is_html:
+                message.attach_alternative(body, 'text/html')
+            
+            try:
+                message.send()
+            except Exception as e:
+                logger.error(f"Failed to send email to {recipient.email}: {e}")
+                recipient.mark_as_failed(str(e))
+                failed_count += 1
+                logs.append(EmailLog(
+                    email_type='bulk_campaign',
+                    recipient_email=recipient.email,
+                    subject=subject,
+                    campaign=campaign,
+                    template_id=campaign.template_id,
+                    sent_by_id=campaign.created_by_id,
+                    is_successful=False,
+                    error_message=str(e),
+                ))
+            else:
+                sent_ids.append(recipient.id)
+                logs.append(EmailLog(
+                    email_type='bulk_campaign',
+                    recipient_email=recipient.email,
+                    subject=subject,
+                    campaign=campaign,
+                    template_id=campaign.template_id,
+                    sent_by_id=campaign.created_by_id,
+                    is_successful=True,
+                ))
+            if len(logs) >= EMAIL_RECORD_CHUNK_SIZE:
+                record_outcomes()
+    finally:
+        connection.close()
+    record_outcomes()
+    
+    logger.info(f"Sent batch for campaign {campaign.name}. Sent: {total_sent}, Failed: {total_failed}")
+    return {'sent': total_sent, 'failed': total_failed}
+
+
+# No longer queued, since campaigns are sent by send_email_batch; kept only to drain messages already in the broker
 @shared_task(bind=True, max_retries=3)
 def send_single_email(self, recipient_id, email_address, subject, body, is_html=True, sent_by_id=None):
     """
@@ -132,8 +273,11 @@ def send_single_email(self, recipient_id, email_address, subject, body, is_html=
     Returns:
         bool: True if successful, False otherwise
     """
+    recipient = None
     try:
-        recipient = EmailRecipient.objects.get(id=recipient_id)
+        # The campaign comes with the recipient, and is reused for the statistics and the log below
+        recipient = EmailRecipient.objects.select_related('campaign').get(id=recipient_id)
+        campaign = recipient.campaign
         
         # Send the email
         send_mail(
@@ -148,25 +292,16 @@ def send_single_email(self, recipient_id, email_address, subject, body, is_html=
         # Mark recipient as sent
         recipient.mark_as_sent()
         
-        # Update campaign statistics
-        campaign = recipient.campaign
-        campaign.emails_sent = EmailRecipient.objects.filter(campaign=campaign, status='sent').count()
-        campaign.emails_failed = EmailRecipient.objects.filter(campaign=campaign, status__in=['failed', 'invalid']).count()
-        campaign.save(update_fields=['emails_sent', 'emails_failed'])
-        
-        # Check if all emails are processed and mark campaign as completed if so
-        pending_count = EmailRecipient.objects.filter(campaign=campaign, status='pending').count()
-        if pending_count == 0 and campaign.status == 'processing':
-            campaign.mark_as_completed()
-            logger.info(f"Campaign {campaign.name} completed. Sent: {campaign.emails_sent}, Failed: {campaign.emails_failed}")
+        # Update campaign statistics; check_campaign_completion marks the campaign completed
+        campaign.increment_counts(sent=1)
         
         # Log the email
         EmailLog.objects.create(
             email_type='bulk_campaign',
             recipient_email=email_address,
             subject=subject,
-            campaign=recipient.campaign,
-            template=recipient.campaign.template,
+            campaign=campaign,
+            template_id=campaign.template_id,
             sent_by_id=sent_by_id,
             is_successful=True
         )
@@ -183,20 +318,11 @@ def send_single_email(self, recipient_id, email_address, subject, body, is_html=
         
         # Mark recipient as failed
         try:
-            recipient = EmailRecipient.objects.get(id=recipient_id)
-            recipient.mark_as_failed(str(e))
-            
-            # Update campaign statistics
-            campaign = recipient.campaign
-            campaign.emails_sent = EmailRecipient.objects.filter(campaign=campaign, status='sent').count()
-            campaign.emails_failed = EmailRecipient.objects.filter(campaign=campaign, status__in=['failed', 'invalid']).count()
-            campaign.save(update_fields=['emails_sent', 'emails_failed'])
-            
-            # Check if all emails are processed and mark campaign as completed if so
-            pending_count = EmailRecipient.objects.filter(campaign=campaign, status='pending').count()
-            if pending_count == 0 and campaign.status == 'processing':
-                campaign.mark_as_completed()
-                logger.info(f"Campaign {campaign.name} completed. Sent: {campaign.emails_sent}, Failed: {campaign.emails_failed}")
+            if recipient is not None:
+                recipient.mark_as_failed(str(e))
+                
+                # Update campaign statistics; check_campaign_completion marks the campaign completed
+                recipient.campaign.increment_counts(failed=1)
         except:
             pass
         
@@ -206,6 +332,8 @@ def send_single_email(self, recipient_id, email_address, subject, body, is_html=
                 email_type='bulk_campaign',
                 recipient_email=email_address,
                 subject=subject,
+                campaign_id=recipient and recipient.campaign_id,
+                template_id=recipient and recipient.campaign.template_id,
                 sent_by_id=sent_by_id,
                 is_successful=False,
                 error_message=str(e)
@@ -221,6 +349,9 @@ def check_campaign_completion(campaign_id):
     """
     Check if a campaign is completed and mark it accordingly.
     This task is scheduled to run after individual email tasks have had time to complete.
+    
+    Args:
+        campaign_id: ID of the BulkEmailCampaign to check
     """
     try:
         campaign = BulkEmailCampaign.objects.get(id=campaign_id)
@@ -228,9 +359,20 @@ def check_campaign_completion(campaign_id):
         # Skip if campaign is already completed or failed
         if campaign.status in ['sent', 'failed', 'partially_sent']:
             return
+        
+        # Recipients claimed long ago belong to a batch task that is gone, e.g. with a worker that stopped, and
+        # nothing will retry them. Whether they were delivered is unknown, so they are failed rather than sent again.
+        # Pending recipients are left alone, as their batch task may just be waiting in the queue.
+        timed_out = EmailRecipient.objects.filter(
+            campaign=campaign, status='sending', claimed_at__lt=timezone.now() - SENDING_TIMEOUT,
+        ).update(status='failed', error_message='Sending stopped before the outcome was known')
+        if timed_out:
+            logger.error(f"Campaign {campaign.name} timed out sending {timed_out} emails, marking them as failed")
+            campaign.increment_counts(failed=timed_out)
+            campaign.refresh_from_db(fields=['emails_sent', 'emails_failed'])
             
-        # Count pending emails
-        pending_count = EmailRecipient.objects.filter(campaign=campaign, status='pending').count()
+        # Count emails that haven't been sent or failed yet
+        pending_count = EmailRecipient.objects.filter(campaign=campaign, status__in=['pending', 'sending']).count()
         
         if pending_count == 0:
             # All emails have been processed, mark campaign as completed
@@ -309,12 +451,17 @@ def cleanup_old_email_logs(days=30):
     Args:
         days: Number of days to keep logs (default: 30)
     """
-    from datetime import timedelta
-    
     cutoff_date = timezone.now() - timedelta(days=days)
     
-    deleted_count = EmailLog.objects.filter(sent_at__lt=cutoff_date).count()
-    EmailLog.objects.filter(sent_at__lt=cutoff_date).delete()
+    # Delete in chunks, so that no single statement holds locks on a large part of the table
+    deleted_count = 0
+    while True:
+        ids = list(EmailLog.objects.filter(sent_at__lt=cutoff_date)
+                   .values_list('id', flat=True)[:LOG_DELETE_BATCH_SIZE])
+        if not ids:
+            break
+        deleted, _ = EmailLog.objects.filter(id__in=ids).delete()
+        deleted_count += deleted
     
     logger.info(f"Cleaned up {deleted_count} old email log entries")
     return deleted_count
@@ -328,26 +475,26 @@ def cleanup_old_campaigns(days=90):
     Args:
         days: Number of days to keep completed campaigns (default: 90)
     """
-    from datetime import timedelta
-    
     cutoff_date = timezone.now() - timedelta(days=days)
     
     old_campaigns = BulkEmailCampaign.objects.filter(
         completed_at__lt=cutoff_date
     )
+    campaign_ids = list(old_campaigns.values_list('id', flat=True))
+    deleted_count = len(campaign_ids)
     
-    deleted_count = 0
-    for campaign in old_campaigns:
-        # Delete uploaded file if it exists
-        if campaign.uploaded_file:
-            try:
-                campaign.uploaded_file.delete(save=False)
-            except:
-                pass
-        deleted_count += 1
+    # Delete uploaded files by name, without loading the campaigns
+    storage = BulkEmailCampaign._meta.get_field('uploaded_file').storage
+    for path in BulkEmailCampaign.objects.filter(id__in=campaign_ids).exclude(uploaded_file='') \
+            .values_list('uploaded_file', flat=True):
+        try:
+            storage.delete(path)
+        except Exception:
+            pass
     
-    # Delete campaigns and their related recipients
-    old_campaigns.delete()
+    # Delete the recipients in one statement before the campaigns, rather than having the campaign delete collect them
+    EmailRecipient.objects.filter(campaign_id__in=campaign_ids).delete()
+    BulkEmailCampaign.objects.filter(id__in=campaign_ids).delete()
     
     logger.info(f"Cleaned up {deleted_count} old email campaigns")
     return deleted_count
\ No newline at end of file
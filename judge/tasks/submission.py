@@ -7,7 +7,7 @@ from django.utils.translation import gettext as _
 from judge.models import Problem, Profile, Submission
 from judge.utils.celery import Progress
 
-__all__ = ('apply_submission_filter', 'rejudge_problem_filter', 'rescore_problem')
+__all__ = ('apply_submission_filter', 'rejudge_contest_problem', 'rejudge_problem_filter', 'rescore_problem')
 
 
 def apply_submission_filter(queryset, id_range, languages, results):
@@ -39,6 +39,21 @@ def rejudge_problem_filter(self, problem_id, id_range=None, languages=None, resu
     return rejudged
 
 
+@shared_task(bind=True)
+def rejudge_contest_problem(self, contest_problem_id, user_id=None):
+    queryset = Submission.objects.filter(contest__problem_id=contest_problem_id)
+    user = User.objects.get(id=user_id) if user_id is not None else None
+
+    rejudged = 0
+    with Progress(self, queryset.count()) as p:
+        for submission in queryset.iterator():
+            submission.judge(rejudge=True, batch_rejudge=True, rejudge_user=user)
+            rejudged += 1
+            if rejudged % 10 == 0:
+                p.done = rejudged
+    return rejudged
+
+
 @shared_task(bind=True)
 def rescore_problem(self, problem_id):
     problem = Problem.objects.get(id=problem_id)
@@ -1,12 +1,75 @@
+from collections import defaultdict
+
 from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import JsonResponse
+from django.db.models import Exists, OuterRef, Q
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 from django.views.decorators.http import require_GET
 
 from judge.models import Problem, MCQQuestion, ProblemType, ProblemGroup
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Largest number of rows the dashboard API returns per page
+DASHBOARD_MAX_LIMIT = 100
+
+
+def _json_response(data):
+    # orjson serializes the dashboard's lists of dicts several times faster than the standard library
+    if orjson is None:
+        return JsonResponse(data)
+    return HttpResponse(orjson.dumps(data), content_type='application/json')
+
+
+def _category_ids():
+    """
+    Return dicts mapping each lowercased group and type name and full name to the ids it names. The tables are small
+    and rarely change, so the mapping is cached until a group or type is saved or deleted.
+    """
+    def build():
+        result = []
+        for model in (ProblemGroup, ProblemType):
+            ids = defaultdict(set)
+            for pk, name, full_name in model.objects.values_list('id', 'name', 'full_name'):
+                ids[name.lower()].add(pk)
+                ids[full_name.lower()].add(pk)
+            result.append({key: list(value) for key, value in ids.items()})
+        return result
+
+    return cache.get_or_set('contest_dashboard:categories', build, 86400)
+
+
+def _category_filter(category, through_model, field):
+    """Match objects whose group or one of whose types is named category, ignoring case."""
+    group_ids, type_ids = _category_ids()
+    group_ids = group_ids.get(category.lower(), [])
+    type_ids = type_ids.get(category.lower(), [])
+    # Matching types through EXISTS instead of a join doesn't duplicate rows, so no DISTINCT is needed
+    return Q(group_id__in=group_ids) | Exists(through_model.objects.filter(
+        **{field: OuterRef('pk')}, problemtype_id__in=type_ids,
+    ))
+
+
+def _serialize_rows(rows, types_through, types_field):
+    """Turn values() rows into API items, fetching the type names of all of them with a single query."""
+    types = defaultdict(list)
+    for object_id, type_name in types_through.objects.filter(**{types_field + '__in': [row['id'] for row in rows]}) \
+            .order_by('problemtype__full_name').values_list(types_field, 'problemtype__name'):
+        types[object_id].append(type_name)
+
+    for row in rows:
+        if 'question_type' in row:
+            row['type'] = row.pop('question_type')
+        row['group'] = row.pop('group__full_name') or 'Uncategorized'
+        row['types'] = types[row['id']]
+    return rows
+
+
 @staff_member_required
 @require_GET
 def contest_dashboard(request):
@@ -17,7 +80,7 @@ def contest_dashboard(request):
 def contest_dashboard_api(request):
     # Parameters
     page = int(request.GET.get('page', 1))
-    limit = int(request.GET.get('limit', 25))
+    limit = min(max(int(request.GET.get('limit', 25)), 1), DASHBOARD_MAX_LIMIT)
     search = request.GET.get('search', '')
     category = request.GET.get('category', '') # Easy, Medium, Hard (mapped to group or type)
     p_type = request.GET.get('type', '')
@@ -33,12 +96,7 @@ def contest_dashboard_api(request):
             )
         if category:
             # Try matching group or type
-            queryset = queryset.filter(
-                Q(group__name__iexact=category) | 
-                Q(group__full_name__iexact=category) |
-                Q(types__name__iexact=category) |
-                Q(types__full_name__iexact=category)
-            ).distinct()
+            queryset = queryset.filter(_category_filter(category, MCQQuestion.types.through, 'mcqquestion'))
         
         if p_type:
              queryset = queryset.filter(types__id=p_type)
@@ -48,23 +106,8 @@ def contest_dashboard_api(request):
         if mcq_format:
             queryset = queryset.filter(question_type=mcq_format)
 
-        paginator = Paginator(queryset.order_by('code'), limit)
-        page_obj = paginator.get_page(page)
-        
-        data = {
-            'items': [{
-                'id': q.id,
-                'code': q.code,
-                'name': q.name,
-                'points': q.points,
-                'type': q.question_type,
-                'group': q.group.full_name if q.group else 'Uncategorized',
-                'types': [t.name for t in q.types.all()]
-            } for q in page_obj],
-            'total': paginator.count,
-            'num_pages': paginator.num_pages,
-            'current_page': page
-        }
+        fields = ('id', 'code', 'name', 'points', 'question_type', 'group__full_name')
+        types_through, types_field = MCQQuestion.types.through, 'mcqquestion_id'
     else:
         queryset = Problem.objects.all()
         if search:
@@ -76,42 +119,45 @@ def contest_dashboard_api(request):
         if category:
             # User requested filtering by "Easy", "Medium", "Hard"
             # We check if they match a group or type name
-            queryset = queryset.filter(
-                Q(group__name__iexact=category) | 
-                Q(group__full_name__iexact=category) |
-                Q(types__name__iexact=category) |
-                Q(types__full_name__iexact=category)
-            ).distinct()
+            queryset = queryset.filter(_category_filter(category, Problem.types.through, 'problem'))
 
         if p_type:
             queryset = queryset.filter(types__id=p_type)
 
-        paginator = Paginator(queryset.order_by('code'), limit)
-        page_obj = paginator.get_page(page)
+        fields = ('id', 'code', 'name', 'points', 'group__full_name')
+        types_through, types_field = Problem.types.through, 'problem_id'
 
+    # Rows are read as dicts rather than model instances
+    queryset = queryset.order_by('code').values(*fields)
+    after = request.GET.get('after')
+    if after is not None:
+        # Keyset pagination: codes are unique, so continuing after the last one seen needs neither a COUNT nor an
+        # OFFSET that grows with the page depth. One extra row is fetched to tell whether there is a next page.
+        # The limit is at least 1, so a cursor is only given out after a full page and points at its last row.
+        items = _serialize_rows(list(queryset.filter(code__gt=after)[:limit + 1]), types_through, types_field)
+        has_next = len(items) > limit
+        items = items[:limit]
+        data = {
+            'items': items,
+            'next_cursor': items[-1]['code'] if has_next else None,
+        }
+    else:
+        paginator = Paginator(queryset, limit)
+        page_obj = paginator.get_page(page)
         data = {
-            'items': [{
-                'id': p.id,
-                'code': p.code,
-                'name': p.name,
-                'points': p.points,
-                'group': p.group.full_name if p.group else 'Uncategorized',
-                'types': [t.name for t in p.types.all()]
-            } for p in page_obj],
+            'items': _serialize_rows(list(page_obj), types_through, types_field),
             'total': paginator.count,
             'num_pages': paginator.num_pages,
             'current_page': page
         }
 
-    return JsonResponse(data)
+    return _json_response(data)
 
 @staff_member_required
 @require_GET
 def contest_dashboard_metadata(request):
-    # Return available types and groups for filters
-    types = ProblemType.objects.values('id', 'name', 'full_name')
-    groups = ProblemGroup.objects.values('id', 'name', 'full_name')
-    return JsonResponse({
-        'types': list(types),
-        'groups': list(groups)
-    })
+    # Return available types and groups for filters; cached until a type or group is saved or deleted
+    return _json_response(cache.get_or_set('contest_dashboard:metadata', lambda: {
+        'types': list(ProblemType.objects.values('id', 'name', 'full_name')),
+        'groups': list(ProblemGroup.objects.values('id', 'name', 'full_name')),
+    }, 86400))
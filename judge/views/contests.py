@@ -31,7 +31,8 @@ from reversion import revisions
 
 from judge import event_poster as event
 from judge.comments import CommentedDetailView
-from judge.debug import get_contest_rejoin_debug, get_contest_template_debug, get_proctoring_disable_backend
+from judge.debug import CONTEST_REJOIN_DEBUG_ENABLED, CONTEST_TEMPLATE_DEBUG_ENABLED, \
+    PROCTORING_DISABLE_BACKEND_ENABLED
 from judge.forms import ContestCloneForm
 from judge.models import Contest, ContestMoss, ContestParticipation, ContestProblem, ContestTag, \
     Problem, Profile, Submission
@@ -389,7 +390,7 @@ class ContestDetail(ContestMixin, TitleMixin, CommentedDetailView):
         context['enable_comments'] = settings.DMOJ_ENABLE_COMMENTS
         context['enable_social'] = settings.DMOJ_ENABLE_SOCIAL
         # Use centralized debug configuration
-        context['debug'] = get_contest_template_debug()
+        context['debug'] = CONTEST_TEMPLATE_DEBUG_ENABLED
         return context
 
 
@@ -479,7 +480,7 @@ class ContestJoin(LoginRequiredMixin, ContestMixin, SingleObjectMixin, View):
                                      'You are permanently barred from joining this contest.'))
 
         # Check if user has exited this contest before and cannot rejoin (skip in debug mode for testing)
-        if not get_contest_rejoin_debug() and ContestParticipation.objects.filter(contest=contest, user=profile, has_exited=True).exists():
+        if not CONTEST_REJOIN_DEBUG_ENABLED and ContestParticipation.objects.filter(contest=contest, user=profile, has_exited=True).exists():
             return generic_message(request, _('Cannot rejoin contest'),
                                    _('You have previously exited this contest and cannot rejoin.'))
 
@@ -492,7 +493,7 @@ class ContestJoin(LoginRequiredMixin, ContestMixin, SingleObjectMixin, View):
                 'username': profile.user.username,
                 'contestKey': contest.key,
                 'contestName': contest.name,
-                'disableBackend': get_proctoring_disable_backend(),
+                'disableBackend': PROCTORING_DISABLE_BACKEND_ENABLED,
             },
         })
 
@@ -511,7 +512,7 @@ class ContestJoin(LoginRequiredMixin, ContestMixin, SingleObjectMixin, View):
                                      'You are permanently barred from joining this contest.'))
 
         # Check if user has exited this contest before and cannot rejoin (skip in debug mode for testing)
-        if not get_contest_rejoin_debug() and ContestParticipation.objects.filter(contest=contest, user=profile, has_exited=True).exists():
+        if not CONTEST_REJOIN_DEBUG_ENABLED and ContestParticipation.objects.filter(contest=contest, user=profile, has_exited=True).exists():
             return generic_message(request, _('Cannot rejoin contest'),
                                    _('You have previously exited this contest and cannot rejoin.'))
 
@@ -605,7 +606,7 @@ class ContestProctoredJoin(LoginRequiredMixin, ContestMixin, SingleObjectMixin,
                                      'You are permanently barred from joining this contest.'))
 
         # Check if user has exited this contest before and cannot rejoin (skip in debug mode for testing)
-        if not get_contest_rejoin_debug() and ContestParticipation.objects.filter(contest=contest, user=profile, has_exited=True).exists():
+        if not CONTEST_REJOIN_DEBUG_ENABLED and ContestParticipation.objects.filter(contest=contest, user=profile, has_exited=True).exists():
             return generic_message(request, _('Cannot rejoin contest'),
                                    _('You have previously exited this contest and cannot rejoin.'))
 
@@ -618,7 +619,7 @@ class ContestProctoredJoin(LoginRequiredMixin, ContestMixin, SingleObjectMixin,
                 'username': profile.user.username,
                 'contestKey': contest.key,
                 'contestName': contest.name,
-                'disableBackend': get_proctoring_disable_backend(),
+                'disableBackend': PROCTORING_DISABLE_BACKEND_ENABLED,
             },
         })
 
@@ -659,7 +660,7 @@ class ContestProctoredJoin(LoginRequiredMixin, ContestMixin, SingleObjectMixin,
             )
 
         # Check if user has exited this contest before and cannot rejoin (skip in debug mode for testing)
-        if not get_contest_rejoin_debug() and ContestParticipation.objects.filter(contest=contest, user=profile, has_exited=True).exists():
+        if not CONTEST_REJOIN_DEBUG_ENABLED and ContestParticipation.objects.filter(contest=contest, user=profile, has_exited=True).exists():
             return HttpResponse(
                 json.dumps({
                     'success': False,
@@ -2,6 +2,7 @@ import logging
 import random
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.db import transaction
 from django.db.models import Count, F, Q, Case, When, BooleanField, Prefetch
@@ -14,12 +15,16 @@ from django.utils.translation import gettext as _, gettext_lazy
 from django.views.generic import DetailView, ListView, View
 from django.views.generic.detail import SingleObjectMixin
 
-from judge.models import MCQQuestion, MCQOption, MCQSubmission, ProblemGroup, ProblemType, Profile
+from judge.models import ContestParticipation, MCQQuestion, MCQSubmission, ProblemGroup, ProblemType, Profile
 from judge.utils.diggpaginator import DiggPaginator
 from judge.utils.views import QueryStringSortMixin, TitleMixin, generic_message
 
 __all__ = ['MCQList', 'MCQDetail', 'MCQSubmitView']
 
+# Replacing a submission's answer writes the selected options through table directly: one DELETE and one INSERT,
+# instead of the reads and diffing that selected_options.set() does
+SelectedOption = MCQSubmission.selected_options.through
+
 
 class MCQMixin(object):
     model = MCQQuestion
@@ -28,17 +33,29 @@ class MCQMixin(object):
 
     def get_object(self, queryset=None):
         mcq = super(MCQMixin, self).get_object(queryset)
-        if not mcq.is_public and not self.request.user.is_authenticated:
+        if mcq.is_public:
+            return mcq
+        if not self.request.user.is_authenticated:
+            raise Http404()
+        # Viewing a private question and then submitting answers to it repeats the same permission and organization
+        # queries, so each user's decision for a question is cached for a short while. The signal handlers bump the
+        # question's access version when its access can change.
+        key = MCQQuestion.get_access_cache_key(mcq.id, self.request.user.id)
+        allowed = cache.get(key)
+        if allowed is None:
+            allowed = self.can_access_private_mcq(mcq)
+            cache.set(key, allowed, 30)
+        if not allowed:
             raise Http404()
-        if not mcq.is_public and not mcq.is_editable_by(self.request.user):
-            # Check if user is in organization
-            if mcq.is_organization_private:
-                if not mcq.organizations.filter(id__in=self.request.profile.organizations.all()).exists():
-                    raise Http404()
-            else:
-                raise Http404()
         return mcq
 
+    def can_access_private_mcq(self, mcq):
+        if mcq.is_editable_by(self.request.user):
+            return True
+        # Check if user is in organization
+        return mcq.is_organization_private and \
+            mcq.organizations.filter(id__in=self.request.profile.organizations.all()).exists()
+
     def no_such_mcq(self):
         code = self.kwargs.get(self.slug_url_kwarg, None)
         return generic_message(self.request, _('No such MCQ'),
@@ -52,37 +69,30 @@ class MCQMixin(object):
 
 
 class SolvedMCQMixin(object):
-    def get_completed_mcqs(self):
+    @cached_property
+    def mcq_submission_states(self):
+        """
+        Map each question the user has submitted to in the current context (their contest participation, or outside
+        contests) to whether any of those submissions was correct. Both the completed and attempted sets are built
+        from this one query.
+        """
         if self.in_contest:
-            # Get completed MCQs in this contest
-            participation = self.profile.current_contest
-            return set(MCQSubmission.objects.filter(
-                user=self.profile,
-                is_correct=True,
-                participation=participation
-            ).values_list('question_id', flat=True))
+            queryset = MCQSubmission.objects.filter(user=self.profile, participation=self.participation)
         elif self.profile is not None:
-            return set(MCQSubmission.objects.filter(
-                user=self.profile,
-                is_correct=True,
-                participation__isnull=True  # Only non-contest submissions
-            ).values_list('question_id', flat=True))
-        return set()
+            # Only non-contest submissions
+            queryset = MCQSubmission.objects.filter(user=self.profile, participation__isnull=True)
+        else:
+            return {}
+        states = {}
+        for question_id, is_correct in queryset.values_list('question_id', 'is_correct'):
+            states[question_id] = states.get(question_id, False) or is_correct
+        return states
+
+    def get_completed_mcqs(self):
+        return {question_id for question_id, is_correct in self.mcq_submission_states.items() if is_correct}
 
     def get_attempted_mcqs(self):
-        if self.in_contest:
-            # Get attempted MCQs in this contest
-            participation = self.profile.current_contest
-            return set(MCQSubmission.objects.filter(
-                user=self.profile,
-                participation=participation
-            ).values_list('question_id', flat=True))
-        elif self.profile is not None:
-            return set(MCQSubmission.objects.filter(
-                user=self.profile,
-                participation__isnull=True  # Only non-contest submissions
-            ).values_list('question_id', flat=True))
-        return set()
+        return set(self.mcq_submission_states)
 
     @cached_property
     def profile(self):
@@ -90,13 +100,18 @@ class SolvedMCQMixin(object):
             return None
         return self.request.profile
     
+    @cached_property
+    def participation(self):
+        # Resolved once per request by ContestMiddleware, together with its contest
+        return self.request.participation if self.profile is not None else None
+
     @cached_property
     def in_contest(self):
-        return self.profile is not None and self.profile.current_contest is not None
+        return self.participation is not None
     
     @cached_property
     def contest(self):
-        return self.profile.current_contest.contest if self.in_contest else None
+        return self.participation.contest if self.in_contest else None
 
 
 class MCQList(QueryStringSortMixin, TitleMixin, SolvedMCQMixin, ListView):
@@ -110,6 +125,8 @@ class MCQList(QueryStringSortMixin, TitleMixin, SolvedMCQMixin, ListView):
     all_sorts = sql_sort | manual_sort
     default_desc = frozenset(('points', 'ac_rate', 'user_count'))
     default_sort = 'code'
+    list_fields = ('code', 'name', 'question_type', 'points', 'ac_rate', 'user_count', 'group__name',
+                   'group__full_name')
 
     def get_paginator(self, queryset, per_page, orphans=0,
                       allow_empty_first_page=True, **kwargs):
@@ -163,36 +180,28 @@ class MCQList(QueryStringSortMixin, TitleMixin, SolvedMCQMixin, ListView):
         """Get MCQs for the current contest"""
         from judge.models import ContestMCQ
         
-        # Get the MCQ IDs that are in this contest
-        contest_mcq_data = ContestMCQ.objects.filter(
-            contest=self.contest
-        ).values('mcq_question_id', 'points', 'order')
-        
-        # Create a dict for quick lookup of contest data
-        contest_data = {cm['mcq_question_id']: {'points': cm['points'], 'order': cm['order']} 
-                       for cm in contest_mcq_data}
-        mcq_ids = list(contest_data.keys())
+        # Load the contest's MCQs together with their questions and groups, in contest order. Only the columns the
+        # list shows are fetched.
+        contest_mcqs = ContestMCQ.objects.filter(contest=self.contest).order_by('order') \
+            .select_related('mcq_question__group') \
+            .only('order', 'points', *('mcq_question__' + field for field in self.list_fields))
 
         # Filter randomized MCQs
-        if self.profile and self.profile.current_contest and self.profile.current_contest.contest_id == self.contest.id:
-            participation = self.profile.current_contest
+        selected_ids = None
+        if self.participation is not None and self.participation.contest_id == self.contest.id:
+            participation = self.participation
             if participation.format_data and 'selected_mcqs' in participation.format_data:
                 selected_ids = set(participation.format_data['selected_mcqs'])
-                mcq_ids = [mid for mid in mcq_ids if mid in selected_ids]
-        
-        # Get the actual MCQQuestion objects
-        queryset = MCQQuestion.objects.filter(
-            id__in=mcq_ids
-        ).select_related('group').prefetch_related('options')
-        
+
         # Annotate each MCQ with its contest-specific data
-        mcqs = list(queryset)
-        for mcq in mcqs:
-            mcq.contest_points = contest_data[mcq.id]['points']
-            mcq.contest_order = contest_data[mcq.id]['order']
-        
-        # Sort by contest order
-        mcqs.sort(key=lambda x: x.contest_order)
+        mcqs = []
+        for contest_mcq in contest_mcqs:
+            mcq = contest_mcq.mcq_question
+            if selected_ids is not None and mcq.id not in selected_ids:
+                continue
+            mcq.contest_points = contest_mcq.points
+            mcq.contest_order = contest_mcq.order
+            mcqs.append(mcq)
         
         return mcqs
 
@@ -205,7 +214,7 @@ class MCQList(QueryStringSortMixin, TitleMixin, SolvedMCQMixin, ListView):
             # Include organization private questions if user is in organization
             filter |= Q(is_organization_private=True, organizations__in=self.profile.organizations.all())
         
-        queryset = MCQQuestion.objects.filter(filter).select_related('group').prefetch_related('options').distinct()
+        queryset = MCQQuestion.objects.filter(filter).select_related('group').only(*self.list_fields).distinct()
         
         if self.profile is not None and self.hide_solved:
             completed = self.get_completed_mcqs()
@@ -330,13 +339,14 @@ class MCQDetail(MCQMixin, SolvedMCQMixin, TitleMixin, DetailView):
         context['in_contest'] = self.in_contest
         context['show_answer'] = True  # Default to showing answers
         
-        # Get user's submission if exists - filter by contest context
-        if user.is_authenticated:
+        # Get user's submission if exists - filter by contest context. The submission states loaded above already tell
+        # whether there is one, so unattempted questions don't need the lookup.
+        if user.is_authenticated and self.object.id in self.mcq_submission_states:
             try:
                 # Check if user is in a contest
                 if self.in_contest:
                     # Get submission for current contest
-                    participation = self.profile.current_contest
+                    participation = self.participation
                     submission = MCQSubmission.objects.get(
                         question=self.object, 
                         user=user.profile,
@@ -388,25 +398,26 @@ class MCQSubmitView(LoginRequiredMixin, MCQMixin, SolvedMCQMixin, SingleObjectMi
         # Get selected options (can be empty for clearing answer)
         selected_option_ids = request.POST.getlist('options')
         
-        # Validate selected options belong to this question (if any selected)
+        # Validate selected options belong to this question (if any selected), against its cached options rather
+        # than with another query
         if selected_option_ids:
-            selected_options = MCQOption.objects.filter(
-                id__in=selected_option_ids,
-                question=self.object
-            )
+            try:
+                selected_options = {int(option_id) for option_id in selected_option_ids}
+            except ValueError:
+                selected_options = None
             
-            if selected_options.count() != len(selected_option_ids):
+            if selected_options is None or not selected_options <= self.object.get_option_correctness().keys():
                 return JsonResponse({
                     'success': False,
                     'error': _('Invalid option selected.')
                 })
         else:
             # No options selected - will clear the answer or result in 0 points
-            selected_options = MCQOption.objects.none()
+            selected_options = []
         
         # Check if user is in a contest
         in_contest = self.in_contest
-        participation = self.profile.current_contest if in_contest else None
+        participation = self.participation
         contest = self.contest if in_contest else None
         
         # Get or check ContestMCQ if in contest
@@ -424,56 +435,62 @@ class MCQSubmitView(LoginRequiredMixin, MCQMixin, SolvedMCQMixin, SingleObjectMi
         # Create or update submission based on context
         with transaction.atomic():
             if in_contest and contest_mcq:
-                # Contest mode: Use get_or_create to allow answer updates
+                # Contest mode: Use get_or_create to allow answer updates. Concurrent saves by the same user are
+                # serialised on their participation row, which always exists, so that two first answers can't both
+                # insert a submission and a changed answer's option writes can't interleave with another's.
+                ContestParticipation.objects.select_for_update().only('id').get(pk=participation.pk)
+                # The answer is scored up front, so that a first answer is inserted already scored.
+                scored = MCQSubmission(question=self.object)
+                scored.calculate_score(points=contest_mcq.points, selected_ids=selected_options, save=False)
+                score = {'is_correct': scored.is_correct, 'points_earned': scored.points_earned}
                 submission, created = MCQSubmission.objects.get_or_create(
                     question=self.object,
                     user=request.profile,
                     participation=participation,
-                    contest_object=contest_mcq
+                    contest_object=contest_mcq,
+                    defaults=score,
                 )
                 
                 # Update selected options (allows changing answer)
-                submission.selected_options.set(selected_options)
-                
-                # Use contest points for scoring
-                self.object.points = contest_mcq.points
-                submission.calculate_score()
+                if not created:
+                    SelectedOption.objects.filter(mcqsubmission=submission).delete()
+                    MCQSubmission.objects.filter(pk=submission.pk).update(**score)
+                    submission.is_correct = scored.is_correct
+                    submission.points_earned = scored.points_earned
+                SelectedOption.objects.bulk_create([
+                    SelectedOption(mcqsubmission=submission, mcqoption_id=option_id) for option_id in selected_options
+                ])
                 
             else:
                 # Normal mode: Check if already submitted
-                existing_submission = MCQSubmission.objects.filter(
+                already_submitted = MCQSubmission.objects.filter(
                     question=self.object,
                     user=request.profile,
                     participation__isnull=True
-                ).first()
+                ).exists()
                 
-                if existing_submission:
+                if already_submitted:
                     return JsonResponse({
                         'success': False,
                         'error': _('You have already submitted an answer for this question.')
                     })
                 
-                # Create new submission
-                submission = MCQSubmission.objects.create(
-                    question=self.object,
-                    user=request.profile
-                )
-                submission.selected_options.set(selected_options)
-                submission.calculate_score()
+                # Create new submission, scored before it is inserted
+                submission = MCQSubmission(question=self.object, user=request.profile)
+                submission.calculate_score(selected_ids=selected_options, save=False)
+                submission.save()
+                SelectedOption.objects.bulk_create([
+                    SelectedOption(mcqsubmission=submission, mcqoption_id=option_id) for option_id in selected_options
+                ])
         
         # Update question statistics (only for non-contest or after contest ends)
         if not in_contest:
-            self.object.user_count = MCQSubmission.objects.filter(
-                question=self.object, 
-                is_correct=True,
-                participation__isnull=True
-            ).count()
-            total_submissions = MCQSubmission.objects.filter(
-                question=self.object,
-                participation__isnull=True
-            ).count()
-            if total_submissions > 0:
-                self.object.ac_rate = (self.object.user_count / total_submissions) * 100
+            stats = MCQSubmission.objects.filter(question=self.object, participation__isnull=True).aggregate(
+                total=Count('id'), correct=Count('id', filter=Q(is_correct=True)),
+            )
+            self.object.user_count = stats['correct']
+            if stats['total'] > 0:
+                self.object.ac_rate = (self.object.user_count / stats['total']) * 100
             self.object.save(update_fields=['user_count', 'ac_rate'])
         
         # Determine if we should show the answer
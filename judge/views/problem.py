@@ -922,8 +922,8 @@ class ProblemUnified(ProblemDetail):
         context['ACE_URL'] = settings.ACE_URL if hasattr(settings, 'ACE_URL') else '/static/ace'
         
         # Add debug setting for copy/paste blocking
-        from judge.debug import get_disable_copy_paste_blocking
-        context['DISABLE_COPY_PASTE_BLOCKING'] = get_disable_copy_paste_blocking()
+        from judge.debug import DISABLE_COPY_PASTE_BLOCKING_ENABLED
+        context['DISABLE_COPY_PASTE_BLOCKING'] = DISABLE_COPY_PASTE_BLOCKING_ENABLED
         
         return context
 